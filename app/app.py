@@ -2,12 +2,21 @@ from os import environ
 
 import dash
 import dash_bootstrap_components as dbc
-from dashboard import app_layout, generate_callbacks
+import logging
+from dashboard import IMMUTABLE_CACHE_CONTROL, app_layout, generate_callbacks, get_registry, supports_clientside
+from flask import request
+from flask_compress import Compress
+from metrics import init_metrics
+from model_configs import GRIDS
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 app = dash.Dash(
     __name__,
     external_stylesheets=[dbc.themes.ZEPHYR],
+    # Compression is set up below: Flask-Compress reads its settings when it's initialized
+    compress=False,
 )
 app.title = "Simple Dash App"
 
@@ -41,8 +50,62 @@ app.index_string = """<!DOCTYPE html>
 
 
 server = app.server
+# Callback responses (i.e. the figures) are compressed with brotli or gzip, whichever the browser accepts
+server.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+Compress(server)
+# Request counts, durations and payload sizes, exposed at /metrics
+init_metrics(server)
+
+# Switch the projection configs in the browser instead of calling the server on every slider move. The plots of larger
+#   datasets are rendered server-side (see `dashboard.supports_clientside`).
+CLIENTSIDE_CALLBACKS = environ.get("CLIENTSIDE_CALLBACKS", "false").lower() in ("1", "true", "yes")
+if CLIENTSIDE_CALLBACKS and not supports_clientside():
+    logger.warning("Falling back to server-side callbacks")
+    CLIENTSIDE_CALLBACKS = False
+
+# The layout and callbacks are set at import time, so WSGI servers can serve `app:server` (see gunicorn.conf.py)
+app.layout = app_layout(app, clientside=CLIENTSIDE_CALLBACKS)
+generate_callbacks(app, clientside=CLIENTSIDE_CALLBACKS)
+
+
+@server.after_request
+def set_cache_headers(response):
+    """HTTP caching of the static parts of the app (figures are handled by `dashboard.serve_figure`)
+
+    - Assets are linked with their modification time (`?m=...`) as fingerprint, so they can be cached as immutable.
+    - The layout is always fetched from the same URL, so it gets a strong ETag instead: browsers revalidate it and
+        get a `304 Not Modified` without any payload as long as it doesn't change.
+
+    :return:
+    """
+    prefix = app.config.routes_pathname_prefix
+    if request.path.startswith(f"{prefix}{app.config.assets_url_path}/") and "m" in request.args:
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    elif request.path == f"{prefix}_dash-layout" and response.status_code == 200:
+        response.add_etag()
+        response.headers["Cache-Control"] = "no-cache"
+        response.make_conditional(request)
+    return response
+
+
+@server.route("/healthz")
+def healthz():
+    """Health check of the load balancer/orchestrator: the process serves requests and the projections (of the default
+        dataset, so the check doesn't load every dataset) are readable
+
+    A method without projections (e.g. t-SNE for a dataset precomputed in out-of-core mode) is reported as missing,
+        the dataset is still served with the other one.
+
+    :return:
+    """
+    try:
+        loaded = get_registry().get(get_registry().default)
+        n_configs = {method: len(loaded.store(method)) for method in loaded.methods}
+    # ValueError covers an unreadable index (JSONDecodeError) and a store that doesn't match the parameter grid
+    except (OSError, ValueError) as e:
+        return {"status": "error", "error": str(e)}, 503
+    return {"status": "ok", "configs": n_configs, "missing": [method for method in GRIDS if method not in n_configs]}
+
 
 if __name__ == "__main__":
-    app.layout = app_layout(app)
-    generate_callbacks(app)
     app.run_server(debug=False, host="0.0.0.0", port=int(environ.get("PORT", 8000)), use_reloader=False)
@@ -0,0 +1,73 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    projections: {
+        /*
+         * Clientside counterpart of the `add_graph` callback of dashboard.py.
+         * `store` holds all the projections of the selected dataset (see `projections_store_data`), so switching
+         * config only swaps the x/y of the traces of the template figure, and dcc.Graph redraws it with Plotly.react.
+         */
+        update_graph: function (
+            tsneButton,
+            umapButton,
+            tsnePerplexity,
+            tsneLearningRate,
+            tsneNumIterations,
+            umapNumNeighbors,
+            umapMinDistance,
+            relayoutData,
+            store,
+            umapActive
+        ) {
+            const changedId = dash_clientside.callback_context.triggered.map((t) => t.prop_id)[0] || "";
+            // All the points are already in the figure, zooming/panning doesn't need any new data. Nothing can be
+            // shown until the projections of the dataset are loaded.
+            if (changedId.startsWith("scatter-plot") || !store) {
+                return Array(5).fill(window.dash_clientside.no_update);
+            }
+            // A dataset may only have the projections of one method (see `get_methods`)
+            const isUmap =
+                !store.tsne ||
+                (!!store.umap &&
+                    (changedId.includes("umap-button") ||
+                        (umapActive && (changedId.startsWith("slider") || changedId.startsWith("projections-store")))));
+
+            // Slider values in the order of the axes of the parameter grid
+            const method = isUmap ? store.umap : store.tsne;
+            const values = isUmap
+                ? [umapNumNeighbors, umapMinDistance]
+                : [tsnePerplexity, tsneNumIterations, tsneLearningRate];
+            const offset = method.axes.reduce(
+                (acc, axis, i) => acc * axis.length + axis.indexOf(values[i]),
+                0
+            );
+            const [xs, ys] = method.projections[offset];
+
+            const figure = Object.assign({}, store.figure, {
+                data: store.figure.data.map((trace, i) =>
+                    Object.assign({}, trace, {
+                        x: store.trace_rows[i].map((row) => xs[row]),
+                        y: store.trace_rows[i].map((row) => ys[row]),
+                    })
+                ),
+            });
+            return [figure, isUmap, !isUmap, !isUmap, isUmap];
+        },
+        /*
+         * Server-side mode: `source` is set by the `add_graph` callback, either to the figure itself or to the URL of
+         * the figure of a precomputed config. That URL is content-addressed and cached as immutable, so the figure of
+         * a config seen before comes from the HTTP cache of the browser (or of a CDN) instead of the server.
+         */
+        fetch_figure: async function (source) {
+            if (!source) {
+                return window.dash_clientside.no_update;
+            }
+            if (source.figure) {
+                return source.figure;
+            }
+            const response = await fetch(source.url);
+            if (!response.ok) {
+                throw new Error(`Failed to fetch ${source.url}: ${response.status}`);
+            }
+            return response.json();
+        },
+    },
+});
@@ -0,0 +1,434 @@
+from pathlib import Path
+from typing import Dict, List
+
+import argparse
+import json
+import multiprocessing
+import numpy as np
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+APP_DIR = Path(__file__).resolve().parent
+
+# Number of features of the synthetic data
+N_FEATURES = 10
+
+# Budget of the import of the app (median over the runs), enforced by the `startup` command
+STARTUP_BUDGET_S = 3.0
+# Modules of the compute path, which the web process must never import
+COMPUTE_MODULES = ["dataclasses_json", "numba", "openTSNE", "sklearn", "umap"]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def synthetic_data(n_samples: int, n_features: int = N_FEATURES, n_clusters: int = 5, seed: int = 0) -> np.ndarray:
+    """Gaussian blobs, so the projections have some structure to find
+
+    :return: A float32 array of shape (n_samples, n_features)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=10.0, size=(n_clusters, n_features))
+    return (centers[rng.integers(n_clusters, size=n_samples)] + rng.normal(size=(n_samples, n_features))).astype(
+        np.float32
+    )
+
+
+def _time_fit(method: str, model_index: int, n_samples: int) -> Dict[str, float]:
+    """Time a single fit. It runs in its own process, so the peak RSS is the one of this fit only.
+
+    :return:
+    """
+    import prepare_results
+
+    fit_func, prepare_func, models = {
+        "tsne": (prepare_results._fit_tsne, prepare_results._prepare_tsne_inputs, prepare_results.TSNE_MODELS),
+        "umap": (prepare_results._fit_umap, prepare_results._prepare_umap_inputs, prepare_results.UMAP_MODELS),
+    }[method]
+    model = models[model_index]
+
+    # Warm-up on a tiny dataset, so numba's JIT compilation isn't part of the measurement
+    warmup_data = synthetic_data(200)
+    fit_func(model, prepare_func(warmup_data, [model]))
+
+    data = synthetic_data(n_samples)
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    fit_func(model, prepare_func(data, [model]))
+    wall_time = time.perf_counter() - start
+    return {
+        "wall_time_s": wall_time,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_increase_mb": _peak_rss_mb() - rss_before,
+        "points_per_s": n_samples / wall_time,
+    }
+
+
+def benchmark_fit(sizes: List[int], methods: List[str], all_models: bool) -> List[dict]:
+    import prepare_results
+
+    n_models = {"tsne": len(prepare_results.TSNE_MODELS), "umap": len(prepare_results.UMAP_MODELS)}
+    results = []
+    for method in methods:
+        model_indices = range(n_models[method]) if all_models else [0]
+        for model_index in model_indices:
+            model = {"tsne": prepare_results.TSNE_MODELS, "umap": prepare_results.UMAP_MODELS}[method][model_index]
+            for n_samples in sizes:
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    metrics = executor.submit(_time_fit, method, model_index, n_samples).result()
+                result = {"method": method, "config": model.get_properties_str(), "n_samples": n_samples, **metrics}
+                print(
+                    f"{method} {result['config']} n={n_samples}: {metrics['wall_time_s']:.2f} s, "
+                    f"{metrics['points_per_s']:.0f} points/s, peak RSS {metrics['peak_rss_mb']:.0f} MB"
+                )
+                results.append(result)
+    return results
+
+
+def _recall(indices: np.ndarray, exact_indices: np.ndarray) -> float:
+    """Share of the exact neighbors of each sample found by an approximate search, averaged over the samples
+
+    :return:
+    """
+    # The neighbors of a sample are distinct, so each neighbor found by both searches appears twice in the sorted row
+    both = np.sort(np.hstack([indices, exact_indices]), axis=1)
+    return float((both[:, 1:] == both[:, :-1]).sum() / exact_indices.size)
+
+
+def benchmark_neighbors(sizes: List[int], dims: List[int], backends: List[str]) -> List[dict]:
+    """Recall and speed of the nearest neighbor backends of the sweeps (see `neighbors.knn_graph`), for each number of
+        neighbors the parameter grids need: `3 * perplexity` for t-SNE and `n_neighbors` (minus the sample itself)
+        for UMAP
+
+    The HNSW index is built once per dataset (`index_build_s`) and persisted, and every search then loads it.
+
+    :return:
+    """
+    import neighbors
+    from model_configs import TSNE_GRID, UMAP_GRID
+
+    # Warm-up on a tiny dataset, so numba's JIT compilation (NN-descent) isn't part of the measurement
+    for backend in backends:
+        neighbors.knn_graph(synthetic_data(200), 10, backend)
+
+    results = []
+    for n_samples in sizes:
+        for n_features in dims:
+            data = synthetic_data(n_samples, n_features)
+            n_neighbors = sorted(
+                {min(n_samples - 1, int(3 * perplexity)) for perplexity in TSNE_GRID.axes["perplexity"]}
+                | {k - 1 for k in UMAP_GRID.axes["n_neighbors"]}
+            )
+            exact_indices, _ = neighbors.knn_graph(data, max(n_neighbors), "exact")
+            for backend in backends:
+                with tempfile.TemporaryDirectory() as index_dir:
+                    index_build_s = 0.0
+                    if backend == "hnsw":
+                        start = time.perf_counter()
+                        neighbors._hnsw_index(np.ascontiguousarray(data), Path(index_dir))
+                        index_build_s = time.perf_counter() - start
+                    for k in n_neighbors:
+                        start = time.perf_counter()
+                        indices, _ = neighbors.knn_graph(data, k, backend, Path(index_dir))
+                        wall_time = time.perf_counter() - start
+                        result = {
+                            "method": backend,
+                            "config": f"n_features={n_features}__k={k}",
+                            "n_samples": n_samples,
+                            "wall_time_s": wall_time,
+                            "index_build_s": index_build_s,
+                            "recall": _recall(indices, exact_indices[:, :k]),
+                        }
+                        print(
+                            f"{backend} n={n_samples} d={n_features} k={k}: {wall_time:.2f} s "
+                            f"(+{index_build_s:.2f} s index build), recall {result['recall']:.4f}"
+                        )
+                        results.append(result)
+    return results
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    latencies_ms = 1000 * np.asarray(latencies)
+    return {
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max()),
+        "n_requests": len(latencies_ms),
+    }
+
+
+def benchmark_startup(repeat: int) -> dict:
+    """Time the import of the app (i.e. what a new worker process goes through) in fresh interpreters
+
+    :return:
+    """
+    code = (
+        "import json, sys, time; start = time.perf_counter(); import app; import_time = time.perf_counter() - start; "
+        f"print(json.dumps([import_time, [m for m in {COMPUTE_MODULES!r} if m in sys.modules]]))"
+    )
+    import_times, process_times, compute_modules = [], [], set()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+        process_times.append(time.perf_counter() - start)
+        import_time, modules = json.loads(out.stdout.strip().splitlines()[-1])
+        import_times.append(import_time)
+        compute_modules.update(modules)
+    return {
+        "import_s": float(np.median(import_times)),
+        "process_s": float(np.median(process_times)),
+        "n_runs": repeat,
+        "compute_modules": sorted(compute_modules),
+    }
+
+
+def check_startup(startup: dict, budget: float) -> bool:
+    """Check the startup of the app against its budget, and that it doesn't import the compute path
+
+    :return: Whether the checks passed
+    """
+    print(f"startup: import {startup['import_s']:.2f} s (budget {budget:.2f} s), process {startup['process_s']:.2f} s")
+    passed = True
+    if startup["import_s"] > budget:
+        print(f"FAIL: the import of the app takes {startup['import_s']:.2f} s, over the budget of {budget:.2f} s")
+        passed = False
+    if startup["compute_modules"]:
+        print(f"FAIL: the app imports modules of the compute path: {', '.join(startup['compute_modules'])}")
+        passed = False
+    return passed
+
+
+def _graph_callback_request(dependencies: List[dict], trigger: str, values: Dict[str, object]) -> dict:
+    """Build the body of the request Dash's renderer sends to `/_dash-update-component` for the graph callback
+
+    :return:
+    """
+    callback = next(d for d in dependencies if "figure-source.data" in d["output"])
+    outputs = [dict(zip(["id", "property"], o.split("."))) for o in callback["output"].strip(".").split("...")]
+    inputs, state = [
+        [{"id": p["id"], "property": p["property"], "value": values.get(f"{p['id']}.{p['property']}")} for p in props]
+        for props in [callback["inputs"], callback["state"]]
+    ]
+    return {
+        "output": callback["output"],
+        "outputs": outputs,
+        "inputs": inputs,
+        "state": state,
+        "changedPropIds": [trigger],
+    }
+
+
+def benchmark_dashboard(repeat: int) -> dict:
+    """Drive the graph callback through the Flask test client of the app, for every config of the sweeps
+
+    The first request of a config is reported separately ("cold"), since the figures are cached afterwards. Like in
+        the browser (without its HTTP cache), a request is followed by the fetch of the figure from the URL returned by
+        the callback.
+
+    :return:
+    """
+    import app as app_module
+    from dashboard import app_layout, generate_callbacks, get_registry
+    from model_configs import TSNE_MODELS, UMAP_MODELS
+
+    app = app_module.app
+    if app.layout is None:
+        app.layout = app_layout(app)
+        generate_callbacks(app)
+    client = app.server.test_client()
+
+    start = time.perf_counter()
+    layout = client.get("/_dash-layout")
+    layout_time = time.perf_counter() - start
+    dependencies = client.get("/_dash-dependencies").get_json()
+
+    # Like in the browser, every slider has a value, whichever method is selected
+    dataset_values = {"dataset-dropdown.value": get_registry().default}
+    tsne_values = {
+        "slider-perplexity.value": TSNE_MODELS[0].perplexity,
+        "slider-learning-rate.value": TSNE_MODELS[0].learning_rate,
+        "slider-num-iterations.value": TSNE_MODELS[0].num_iteration,
+    }
+    umap_values = {
+        "slider-num-neighbors.value": UMAP_MODELS[0].n_neighbors,
+        "slider-min-distance.value": UMAP_MODELS[0].min_dist,
+    }
+    requests = [
+        (
+            "tsne",
+            "slider-perplexity.value",
+            {
+                **dataset_values,
+                **umap_values,
+                "slider-perplexity.value": model.perplexity,
+                "slider-learning-rate.value": model.learning_rate,
+                "slider-num-iterations.value": model.num_iteration,
+            },
+        )
+        for model in TSNE_MODELS
+    ] + [
+        (
+            "umap",
+            "umap-button.n_clicks",
+            {
+                **dataset_values,
+                **tsne_values,
+                "umap-button.n_clicks": 1,
+                "umap-button.active": True,
+                "slider-num-neighbors.value": model.n_neighbors,
+                "slider-min-distance.value": model.min_dist,
+            },
+        )
+        for model in UMAP_MODELS
+    ]
+
+    results = {"layout": {"latency_ms": 1000 * layout_time, "payload_bytes": len(layout.data)}}
+    for method in ["tsne", "umap"]:
+        cold, warm, payload_bytes = [], [], []
+        for request_method, trigger, values in requests:
+            if request_method != method:
+                continue
+            body = _graph_callback_request(dependencies, trigger, values)
+            for i in range(repeat + 1):
+                start = time.perf_counter()
+                response = client.post("/_dash-update-component", json=body)
+                if response.status_code != 200:
+                    raise RuntimeError(f"Callback failed ({response.status_code}): {response.data[:500]}")
+                source = response.get_json()["response"]["figure-source"]["data"]
+                if "url" in source:
+                    response = client.get(source["url"])
+                latency = time.perf_counter() - start
+                (warm if i else cold).append(latency)
+            payload_bytes.append(len(response.data))
+        results[method] = {
+            "cold": _percentiles(cold),
+            "warm": _percentiles(warm),
+            "payload_bytes": float(np.mean(payload_bytes)),
+        }
+        print(
+            f"{method}: cold p50 {results[method]['cold']['p50_ms']:.1f} ms, "
+            f"warm p50 {results[method]['warm']['p50_ms']:.2f} ms / p99 {results[method]['warm']['p99_ms']:.2f} ms, "
+            f"{results[method]['payload_bytes']:.0f} bytes"
+        )
+    return results
+
+
+def _flatten(results, prefix: str = "") -> Dict[str, float]:
+    """Flatten the (nested) results into {"path/to/metric": value}, so runs can be compared metric by metric
+
+    :return:
+    """
+    if isinstance(results, dict):
+        flat = {}
+        for key, value in results.items():
+            flat.update(_flatten(value, f"{prefix}/{key}" if prefix else key))
+        return flat
+    if isinstance(results, list):
+        # List of fit results, identified by their method, config and number of samples
+        flat = {}
+        for item in filter(lambda item: isinstance(item, dict), results):
+            metrics = {k: v for k, v in item.items() if k not in ("method", "config", "n_samples")}
+            flat.update(_flatten(metrics, f"{prefix}/{item['method']}/{item['config']}/{item['n_samples']}"))
+        return flat
+    return {prefix: results} if isinstance(results, (int, float)) else {}
+
+
+def compare(old_filepath: Path, new_filepath: Path) -> None:
+    with open(old_filepath) as f:
+        old = json.load(f)
+    with open(new_filepath) as f:
+        new = json.load(f)
+    old_metrics, new_metrics = _flatten(old["results"]), _flatten(new["results"])
+    print(f"{'metric':<80} {old['commit']:>12} {new['commit']:>12} {'change':>8}")
+    for metric in sorted(old_metrics.keys() & new_metrics.keys()):
+        old_value, new_value = old_metrics[metric], new_metrics[metric]
+        change = f"{100 * (new_value - old_value) / old_value:+.1f}%" if old_value else ""
+        print(f"{metric:<80} {old_value:>12.4g} {new_value:>12.4g} {change:>8}")
+
+
+def _save(results: dict, output: Path) -> None:
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of the precompute job and of the dashboard. Results are saved as JSON along with the "
+        "git commit they were measured on, so runs on different commits can be compared with the `compare` command."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fit_parser = subparsers.add_parser("fit", help="Time the t-SNE/UMAP fits on synthetic data")
+    fit_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    fit_parser.add_argument("--methods", nargs="+", choices=["tsne", "umap"], default=["tsne", "umap"])
+    fit_parser.add_argument("--all-models", action="store_true", help="Time every config instead of the first one")
+    fit_parser.add_argument("--output", type=Path, default=Path("benchmark_fit.json"))
+
+    neighbors_parser = subparsers.add_parser(
+        "neighbors", help="Recall vs speed of the nearest neighbor backends over the parameter grids"
+    )
+    neighbors_parser.add_argument("--sizes", type=int, nargs="+", default=[5_000, 20_000, 100_000])
+    neighbors_parser.add_argument("--dims", type=int, nargs="+", default=[N_FEATURES, 50])
+    neighbors_parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=["exact", "nndescent", "hnsw"],
+        default=["exact", "nndescent", "hnsw"],
+        help="hnsw requires hnswlib",
+    )
+    neighbors_parser.add_argument("--output", type=Path, default=Path("benchmark_neighbors.json"))
+
+    dashboard_parser = subparsers.add_parser("dashboard", help="Time the app startup and the graph callback")
+    dashboard_parser.add_argument("--repeat", type=int, default=20, help="Warm requests per config")
+    dashboard_parser.add_argument("--startup-runs", type=int, default=3)
+    dashboard_parser.add_argument("--output", type=Path, default=Path("benchmark_dashboard.json"))
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="Check the import time of the app against its budget (exits with 1 when over budget)"
+    )
+    startup_parser.add_argument("--runs", type=int, default=5)
+    startup_parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_S, help="Budget in seconds")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare the results of two runs")
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "fit":
+        _save({"fit": benchmark_fit(args.sizes, args.methods, args.all_models)}, args.output)
+    elif args.command == "neighbors":
+        _save({"neighbors": benchmark_neighbors(args.sizes, args.dims, args.backends)}, args.output)
+    elif args.command == "dashboard":
+        startup = benchmark_startup(args.startup_runs)
+        check_startup(startup, STARTUP_BUDGET_S)
+        _save({"startup": startup, "callbacks": benchmark_dashboard(args.repeat)}, args.output)
+    elif args.command == "startup":
+        sys.exit(0 if check_startup(benchmark_startup(args.runs), args.budget) else 1)
+    else:
+        compare(args.old, args.new)
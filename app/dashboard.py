@@ -1,43 +1,194 @@
-from pathlib import Path
-from typing import Dict, List, Union
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import dash
 import dash_bootstrap_components as dbc
-import pickle
+import hashlib
+import json
+import logging
+import numpy as np
+import pandas as pd
 import plotly.express as px
-from dash import Input, Output, callback_context, dcc, html
+import plotly.graph_objects as go
+from dash import ClientsideFunction, Input, Output, State, callback_context, dcc, html, no_update
+from dash.exceptions import PreventUpdate
+from dataset_registry import DatasetRegistry, load_dataset_specs
+from datasets import Dataset
+from flask import Response, abort, request
+from functools import lru_cache, wraps
+from job_queue import DONE, FAILED, JobQueue
+from metrics import METRICS, register_cache
+from model_configs import GRIDS, TSNE_PARAMS, UMAP_PARAMS, Model, TSNEobj, UMAPobj
 from plotly.graph_objs import Figure  # Only used for type hint!
-from prepare_results import TSNE_PARAMS, UMAP_PARAMS
+from projection_store import ProjectionStore
+from quality_metrics import QUALITY_METRICS
+from spatial_index import GridIndex
+from urllib.parse import parse_qs, urlencode
 
-DATA_DIR = Path(".")
-TSNE_RESULTS_FILEPATH = DATA_DIR.joinpath("tsne_projection_results.pkl")
-UMAP_RESULTS_FILEPATH = DATA_DIR.joinpath("umap_projection_results.pkl")
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 _BADGE_COLOR = "#0000cd"
 
+# (min, max) of an axis in view, None when the axis isn't zoomed in
+AxisRange = Optional[Tuple[float, float]]
+
 html_anchor_attrs = dict(
     target="_blank",  # Open in a new tab/window
     rel="noreferrer noopener",  # Prevent malicious attacks
 )
 
-with open(UMAP_RESULTS_FILEPATH, "rb") as f:
-    UMAP_PROJECTION_RESULTS = pickle.load(f)
+# The parameter space is finite, so by default the cache can hold the figure of every single config of a dataset. The
+#   figures are cached along with their dataset (see `dataset_lru_cache`), so they count towards the memory budget of the
+#   registry and are evicted along with the dataset.
+FIGURE_CACHE_SIZE = sum(len(grid) for grid in GRIDS.values())
+
+# Above this number of points, scatter plots are rendered with WebGL (Scattergl) instead of SVG
+WEBGL_THRESHOLD = 5_000
+# Above this number of points in view, the projection is aggregated server-side into a density heatmap of
+#   DENSITY_BINS x DENSITY_BINS bins, so the payload and the render time don't grow with the size of the data
+DENSITY_THRESHOLD = 200_000
+DENSITY_BINS = 200
+# The clientside callbacks send every projection of a dataset to the browser, and switching config there only swaps
+#   the x/y of the traces of an SVG scatter plot, so they're limited to the datasets plotted that way
+CLIENTSIDE_MAX_ROWS = WEBGL_THRESHOLD
+# Every frame of an animated sweep holds all its points, so sweeps of larger datasets only show a sample of them
+SWEEP_MAX_POINTS = 20_000
+
+# Point-level details (hover, click and selection) are queried from a spatial index of the projection in view, built
+#   once per config, so the figures don't carry any per-point hover data. The indexes of the most recent configs of a
+#   dataset are cached along with it.
+SPATIAL_INDEX_CACHE_SIZE = 8
+# Number of neighbors (in the projection) listed for a clicked point, and number of points listed for a selection
+CLICK_NEIGHBORS = 10
+SELECTION_TABLE_ROWS = 20
+
+# Step of each slider. Values off the precomputed grid are fitted on demand by the workers of the job queue.
+SLIDER_STEPS = {"perplexity": 1, "learning_rates": 1, "n_iterations": 50, "n_neighbors": 1, "min_dist": 0.05}
+# Parameter (i.e. field of `TSNEobj`/`UMAPobj`) set by each slider, and its title
+SLIDER_PARAMS = {
+    "slider-perplexity": ("perplexity", "Perplexity"),
+    "slider-learning-rate": ("learning_rate", "Learning Rate"),
+    "slider-num-iterations": ("num_iteration", "Number of Iterations"),
+    "slider-num-neighbors": ("n_neighbors", "Number of Neighbors"),
+    "slider-min-distance": ("min_dist", "Minimum Distance"),
+}
+# How often the browser checks whether an on-demand fit has finished
+JOB_POLL_INTERVAL_MS = 1_000
+
+# Figures of the precomputed configs are served at content-addressed URLs, so browsers and CDNs can cache them forever
+FIGURES_URL_PATH = "/_figures"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+# Nothing is read when the module is imported, so a new worker process starts serving right away. A dataset is loaded
+#   by the first callback that needs it (or up front with `load_data`).
+@lru_cache(maxsize=None)
+def get_registry() -> DatasetRegistry:
+    return DatasetRegistry(load_dataset_specs())
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def _json_nbytes(figure: dict) -> int:
+    return len(json.dumps(figure, separators=(",", ":")))
+
+
+def dataset_lru_cache(maxsize: int, sizeof: Callable[[Any], int] = _json_nbytes):
+    """ Like `functools.lru_cache`, for the functions of a dataset (their first argument): the results are cached along
+        with the dataset (see `dataset_registry.LoadedDataset.cached`), up to `maxsize` results per dataset
+
+    :param maxsize: Maximum number of results cached per dataset
+    :param sizeof: Memory of a result, in bytes. Defaults to the size of a figure serialized to JSON.
+    :return:
+    """
+
+    def decorator(func):
+        stats = {"hits": 0, "misses": 0}
+
+        @wraps(func)
+        def wrapper(dataset: str, *args):
+            value, hit = get_registry().get(dataset).cached(
+                func.__name__, args, lambda: func(dataset, *args), maxsize, sizeof
+            )
+            stats["hits" if hit else "misses"] += 1
+            return value
+
+        def cache_info() -> CacheInfo:
+            currsize = sum(loaded.cache_size(func.__name__) for loaded in get_registry().loaded())
+            return CacheInfo(stats["hits"], stats["misses"], maxsize, currsize)
+
+        def cache_clear() -> None:
+            for loaded in get_registry().loaded():
+                loaded.clear_cache(func.__name__)
 
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
 
-with open(TSNE_RESULTS_FILEPATH, "rb") as f:
-    TSNE_PROJECTION_RESULTS = pickle.load(f)
+    return decorator
+
+
+def get_projection_store(dataset: str, method: str) -> ProjectionStore:
+    """ Get the projection store of a method. Projections are memory-mapped, hence shared by all the worker processes.
+
+    :param dataset: Name of the dataset (see `dataset_registry.load_dataset_specs`)
+    :param method: Projection technique, i.e. "tsne" or "umap"
+    :return:
+    """
+    return get_registry().get(dataset).store(method)
+
+
+def get_methods(dataset: str) -> List[str]:
+    """ Methods with projections for a dataset, e.g. only UMAP for a dataset precomputed in out-of-core mode
+
+    :param dataset: Name of the dataset
+    :return:
+    """
+    return get_registry().get(dataset).methods
+
+
+def get_dataset(dataset: str) -> Dataset:
+    # Labels are read once rather than on every callback, and the dashboard doesn't need the features
+    return get_registry().get(dataset).dataset
+
+
+@lru_cache(maxsize=None)
+def get_job_queue() -> JobQueue:
+    return JobQueue()
+
+
+def load_data() -> None:
+    """ Load the labels and open the projection stores of the default dataset ahead of the first request
+
+    :return:
+    """
+    get_registry().get(get_registry().default)
+
+
+METRICS.computed(
+    "dashboard_dataset_bytes",
+    "Memory of the datasets loaded by the process (labels, memory-mapped projections and cached figures), by dataset",
+    lambda: {(("dataset", name),): nbytes for name, nbytes in get_registry().memory_usage().items()},
+)
 
 
 def wrapper_slider(
     available_values: List[Union[int, float]],
     default_value: Union[int, float],
     html_id: str,
+    step: Optional[Union[int, float]] = None,
 ) -> html.Div:
     """ A wrapper around Dash Slider component that computes the min and max of available values for the slider.
 
     :param available_values: A list of available values for the slider
     :param default_value: Default setting shown in the slider
     :param html_id: A unique HTML ID used for callback
+    :param step: Step between the values of the slider. None restricts the slider to the available values.
     :return: a HTML Div containing the Slider component
     """
     min_value, max_value = min(available_values), max(available_values)
@@ -49,21 +200,43 @@ def wrapper_slider(
                 marks={i: str(i) for i in available_values},
                 value=default_value,
                 id=html_id,
-                step=None,
+                step=step,
             )
         ],
         className="slider",
     )
 
 
-def app_layout(app: dash.Dash) -> dbc.Container:
+_SELECTION_HINT = "Click a point to list its nearest neighbors, or select points with the box or lasso tool"
+
+
+def app_layout(app: dash.Dash, clientside: bool = False) -> dbc.Container:
     """ The main function to generate the layout of the interactive dashboard
 
     :param app:
+    :param clientside: Whether to switch configs in the browser, from all the projections of the dataset (see
+        `projections_store_data`)
     :return:
     """
+    # Only the server can fit the configs that aren't precomputed
+    steps = {param: None if clientside else step for param, step in SLIDER_STEPS.items()}
+    registry = get_registry()
     controls = html.Div(
         [
+            # Dataset selection, also set by the `dataset` query parameter of the URL (see `sync_dataset`)
+            dbc.Card(
+                [
+                    dbc.Label("Dataset", className="card_title", style={"margin-left": "4%"}),
+                    dcc.Dropdown(
+                        id="dataset-dropdown",
+                        options=[{"label": name, "value": name} for name in registry.names],
+                        value=registry.default,
+                        clearable=False,
+                    ),
+                ],
+                className="control_box",
+                style={"margin-bottom": "20px"},
+            ),
             # UMAP/t-SNE Selection
             dbc.Card(
                 [
@@ -115,18 +288,21 @@ def app_layout(app: dash.Dash) -> dbc.Container:
                             default_value=min(TSNE_PARAMS["perplexity"]),
                             available_values=TSNE_PARAMS["perplexity"],
                             html_id="slider-perplexity",
+                            step=steps["perplexity"],
                         ),
                         dbc.Label("Learning Rate", className="param_headers"),
                         wrapper_slider(
                             default_value=min(TSNE_PARAMS["learning_rates"]),
                             available_values=TSNE_PARAMS["learning_rates"],
                             html_id="slider-learning-rate",
+                            step=steps["learning_rates"],
                         ),
                         dbc.Label("Number of Iterations", className="param_headers"),
                         wrapper_slider(
                             default_value=min(TSNE_PARAMS["n_iterations"]),
                             available_values=TSNE_PARAMS["n_iterations"],
                             html_id="slider-num-iterations",
+                            step=steps["n_iterations"],
                         ),
                     ],
                     className="control_box params_box",
@@ -143,12 +319,14 @@ def app_layout(app: dash.Dash) -> dbc.Container:
                             default_value=min(UMAP_PARAMS["n_neighbors"]),
                             available_values=UMAP_PARAMS["n_neighbors"],
                             html_id="slider-num-neighbors",
+                            step=steps["n_neighbors"],
                         ),
                         dbc.Label("Minimum Distance", className="param_headers"),
                         wrapper_slider(
                             default_value=min(UMAP_PARAMS["min_dist"]),
                             available_values=UMAP_PARAMS["min_dist"],
                             html_id="slider-min-distance",
+                            step=steps["min_dist"],
                         ),
                     ],
                     className="control_box params_box",
@@ -184,6 +362,7 @@ def app_layout(app: dash.Dash) -> dbc.Container:
     )
     return dbc.Container(
         [
+            dcc.Location(id="url", refresh=False),
             header,
             dbc.Row(
                 dbc.Col(
@@ -274,6 +453,88 @@ def app_layout(app: dash.Dash) -> dbc.Container:
                 ],
                 align="center",
             ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dbc.Card(
+                            [
+                                dbc.Label("Point under the cursor", className="card_title"),
+                                html.Div("Hover over the plot to see the details of a point", id="hover-detail"),
+                            ],
+                            className="control_box",
+                        ),
+                        md=3,
+                    ),
+                    dbc.Col(
+                        dbc.Card(
+                            [
+                                dbc.Label("Selection", className="card_title"),
+                                html.Div(_SELECTION_HINT, id="selection-detail"),
+                            ],
+                            className="plot_box",
+                        ),
+                        md=8,
+                    ),
+                ],
+                align="start",
+                style={"margin-top": "20px"},
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dbc.Card(
+                            [
+                                dbc.Label("Quality of the configs", className="card_title"),
+                                dcc.Dropdown(
+                                    id="metric-dropdown",
+                                    options=[
+                                        {"label": title, "value": name} for name, title in QUALITY_METRICS.items()
+                                    ],
+                                    value="trustworthiness",
+                                    clearable=False,
+                                ),
+                            ],
+                            className="control_box",
+                        ),
+                        md=3,
+                    ),
+                    dbc.Col(
+                        dbc.Card(dcc.Graph(id="metric-heatmap", config={"displaylogo": False}), className="plot_box"),
+                        md=8,
+                    ),
+                ],
+                align="center",
+                style={"margin-top": "20px"},
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dbc.Card(
+                            [
+                                dbc.Label("Animated sweep", className="card_title"),
+                                dbc.Label("Animate along", className="param_headers"),
+                                dcc.Dropdown(id="sweep-axis-dropdown", clearable=False),
+                            ],
+                            className="control_box",
+                        ),
+                        md=3,
+                    ),
+                    dbc.Col(
+                        dbc.Card(dcc.Graph(id="sweep-plot", config={"displaylogo": False}), className="plot_box"),
+                        md=8,
+                    ),
+                ],
+                align="center",
+                style={"margin-top": "20px"},
+            ),
+            *(
+                [dcc.Store(id="projections-store")]
+                if clientside
+                else [
+                    dcc.Interval(id="job-poll", interval=JOB_POLL_INTERVAL_MS, disabled=True),
+                    dcc.Store(id="figure-source"),
+                ]
+            ),
             dbc.Row(
                 dbc.Col(
                     dbc.Label("© 2021 Esmaeil Alizadeh - All Rights Reserved", style={"font-weight": "bold"}),
@@ -288,18 +549,22 @@ def app_layout(app: dash.Dash) -> dbc.Container:
     )
 
 
-def _update_plot_style(fig: Figure) -> Figure:
+def _update_plot_style(fig: Figure, n_points: int) -> Figure:
     """ A function to update the style of the Plotly Scatter plot
 
     Caution: This function changes the input object
 
     :param fig:
+    :param n_points: Number of points in the plot. Large outlined markers are only used for small plots.
     :return:
     """
-    fig.update_traces(
-        marker=dict(size=18, line=dict(width=2, color="black")),
-        opacity=0.5,
-    )
+    if n_points <= WEBGL_THRESHOLD:
+        fig.update_traces(
+            marker=dict(size=18, line=dict(width=2, color="black")),
+            opacity=0.5,
+        )
+    elif n_points <= DENSITY_THRESHOLD:
+        fig.update_traces(marker=dict(size=3), opacity=0.5)
     fig.update_layout(legend_font_size=18)
 
     axes_style = dict(title_font_size=24, title_text="", tickfont_size=18)
@@ -308,31 +573,831 @@ def _update_plot_style(fig: Figure) -> Figure:
     return fig
 
 
-def generate_callbacks(app: dash.Dash) -> None:
-    """The main function to generate all necessary callbacks for the interactive dashboard
+def _density_figure(projection: np.ndarray, x_range: AxisRange, y_range: AxisRange) -> Figure:
+    x, y = projection[:, 0], projection[:, 1]
+    counts, x_edges, y_edges = np.histogram2d(
+        x,
+        y,
+        bins=DENSITY_BINS,
+        range=[x_range or (x.min(), x.max()), y_range or (y.min(), y.max())],
+    )
+    return go.Figure(
+        go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            # Log scale, so sparse regions are still visible next to dense clusters
+            z=np.log1p(counts.T).astype(np.float32),
+            colorscale="Viridis",
+            showscale=False,
+            # No tooltip, but hovering and clicking still query the points of the bin (see `show_hover`)
+            hoverinfo="none",
+        )
+    )
+
+
+def _label_classes(labels: pd.Categorical) -> Tuple[np.ndarray, List[str]]:
+    """ Class of each label and the (string) name of each class, in the order of the categories
+
+    Plotly Express only draws one trace per class for string labels: the integer labels of a `.npy`/`.npz` dataset
+        would be drawn as a continuous color scale instead. Missing labels are a class of their own.
+
+    :param labels: Labels of a dataset
+    :return: The class of each label, i.e. an index into the names of the classes, and the names of the classes
+    """
+    names = [str(category) for category in labels.categories]
+    codes = labels.codes
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(names), codes)
+        names.append("nan")
+    return codes, names
+
+
+def _label_colors(labels: pd.Categorical, rows: Optional[np.ndarray] = None) -> dict:
+    """ Arguments of `px.scatter` coloring the points by label, one trace per class
+
+    :param labels: Labels of a dataset
+    :param rows: Rows of the points, defaults to all the rows
+    :return:
+    """
+    codes, names = _label_classes(labels)
+    if rows is not None:
+        codes = codes[rows]
+    return {"color": np.asarray(names)[codes], "category_orders": {"color": names}}
+
+
+def build_figure(
+    projection: np.ndarray,
+    dataset: Dataset,
+    x_range: AxisRange = None,
+    y_range: AxisRange = None,
+) -> Figure:
+    """ Build the plot of a projection, picking the rendering that suits the number of points in view
+
+    Up to `WEBGL_THRESHOLD` points, it's an SVG scatter plot. Up to `DENSITY_THRESHOLD` points, it's a WebGL scatter
+        plot. Beyond that, the points are binned server-side into a density heatmap.
+    The figure only holds the coordinates of the points: the details of a point are queried on demand when it's
+        hovered or selected (see `get_spatial_index`).
+
+    :param projection: Projection of the data, an (n_samples, 2) array
+    :param dataset: Dataset of the projection, whose labels are used to color the points
+    :param x_range: Only plot the points within this range of x (e.g. after zooming in)
+    :param y_range: Only plot the points within this range of y (e.g. after zooming in)
+    :return:
+    """
+    rows = None
+    if x_range is not None or y_range is not None:
+        in_view = np.ones(len(projection), dtype=bool)
+        for axis, axis_range in enumerate([x_range, y_range]):
+            if axis_range is not None:
+                in_view &= (projection[:, axis] >= axis_range[0]) & (projection[:, axis] <= axis_range[1])
+        rows = np.flatnonzero(in_view)
+        projection = projection[rows]
+
+    n_points = len(projection)
+    with METRICS.span("figure_build"):
+        if n_points > DENSITY_THRESHOLD:
+            fig = _density_figure(projection, x_range, y_range)
+        else:
+            fig = px.scatter(
+                projection,
+                x=0,
+                y=1,
+                **_label_colors(dataset.labels, rows),
+                labels={"color": dataset.label_name.replace("_", " ").title()},
+                render_mode="webgl" if n_points > WEBGL_THRESHOLD else "svg",
+            )
+            # No tooltip (nor its template), the hover events are still sent to `show_hover`
+            fig.update_traces(hoverinfo="none", hovertemplate=None)
+    with METRICS.span("style"):
+        return _update_plot_style(fig, n_points)
+
+
+def _uirevision(dataset: str, method: str, model: Model) -> str:
+    # Keep the zoom of the user when the figure of the same config is refetched with more details
+    return f"{dataset}/{method}/{model.get_properties_str()}"
+
+
+@dataset_lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def get_figure(dataset: str, method: str, offset: int) -> dict:
+    """ Build the (unzoomed) plot of a projection, serialized to plain JSON types
+
+    Building a figure with Plotly Express is by far the most expensive part of the callback, so figures are built
+        once per config and cached. Since the cached figure is made of native Python types, Dash doesn't need to
+        convert any array when sending it.
+
+    :param dataset: Name of the dataset
+    :param method: Projection technique, i.e. "tsne" or "umap"
+    :param offset: Offset of the config in the parameter grid of the method (see `model_configs.ParamGrid`)
+    :return: The figure as a dictionary
+    """
+    with METRICS.span("lookup"):
+        projection = get_projection_store(dataset, method).at(offset)
+    with METRICS.span("labels"):
+        data = get_dataset(dataset)
+    fig = build_figure(projection, data)
+    fig.update_layout(uirevision=_uirevision(dataset, method, GRIDS[method][offset]))
+    with METRICS.span("serialization"):
+        return json.loads(fig.to_json())
+
+
+@dataset_lru_cache(maxsize=FIGURE_CACHE_SIZE, sizeof=lambda result: len(result[0]))
+def get_figure_json(dataset: str, method: str, offset: int) -> Tuple[bytes, str]:
+    """ Serialize the plot of a precomputed config for `serve_figure`
+
+    :param dataset: Name of the dataset
+    :param method: Projection technique, i.e. "tsne" or "umap"
+    :param offset: Offset of the config in the parameter grid of the method
+    :return: The figure as JSON, and its digest (used both in its URL and as its ETag)
+    """
+    figure = get_figure(dataset, method, offset)
+    with METRICS.span("serialization"):
+        body = json.dumps(figure, separators=(",", ":")).encode()
+        return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+register_cache("figure", get_figure)
+register_cache("figure_json", get_figure_json)
+
+
+def figure_url(app: dash.Dash, dataset: str, method: str, offset: int) -> str:
+    _, digest = get_figure_json(dataset, method, offset)
+    return app.get_relative_path(f"{FIGURES_URL_PATH}/{dataset}/{method}/{offset}/{digest}.json")
+
+
+@METRICS.callback("serve_figure")
+def serve_figure(dataset: str, method: str, offset: int, digest: str) -> Response:
+    """ Serve the plot of a precomputed config. Since the URL holds the digest of the figure, the response never
+        changes and it's cached with a strong ETag and a long-lived, immutable Cache-Control.
+
+    :return:
+    """
+    if dataset not in get_registry() or method not in get_methods(dataset) or offset >= len(GRIDS[method]):
+        abort(404)
+    body, figure_digest = get_figure_json(dataset, method, offset)
+    if digest != figure_digest:
+        # The figure changed (e.g. new projections) since the URL was handed out
+        abort(404)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(figure_digest)
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+@dataset_lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def get_metric_heatmap(dataset: str, method: str, metric: str, fixed_positions: Tuple[int, ...]) -> dict:
+    """ Plot a quality metric over the parameter grid of a method. The metrics are precomputed by prepare_results.py,
+        so this is only a lookup in the projection store.
+
+    The first and the last parameters of the grid are the rows and the columns of the heatmap, the other ones (i.e. the
+        number of iterations of t-SNE) are fixed.
+
+    :param dataset: Name of the dataset
+    :param method: Projection technique, i.e. "tsne" or "umap"
+    :param metric: Name of the metric (see `quality_metrics.QUALITY_METRICS`)
+    :param fixed_positions: Position of the value of each fixed parameter along its axis
+    :return: The figure as a dictionary
+    """
+    grid = GRIDS[method]
+    fields = list(grid.axes)
+    values = get_projection_store(dataset, method).metric_values(metric).reshape(grid.shape)
+    values = values[(slice(None), *fixed_positions, slice(None))]
+    hover = f"{fields[0]}=%{{y}}<br>{fields[-1]}=%{{x}}<br>{QUALITY_METRICS[metric]}=%{{z:.3f}}<extra></extra>"
+    fig = go.Figure(
+        go.Heatmap(
+            z=values,
+            # Categorical axes, so the cells have the same size whatever the spacing of the values
+            x=[str(value) for value in grid.axes[fields[-1]]],
+            y=[str(value) for value in grid.axes[fields[0]]],
+            colorscale="Viridis",
+            hovertemplate=hover,
+        )
+    )
+    title = QUALITY_METRICS[metric]
+    if fixed_positions:
+        title += " at " + ", ".join(f"{f}={grid.axes[f][i]}" for f, i in zip(fields[1:-1], fixed_positions))
+    if np.isnan(values).all():
+        title += " (not available, run prepare_results.py again)"
+    fig.update_layout(title=title, xaxis_title=fields[-1], yaxis_title=fields[0])
+    fig.update_xaxes(type="category")
+    fig.update_yaxes(type="category")
+    return json.loads(fig.to_json())
+
+
+register_cache("metric_heatmap", get_metric_heatmap)
+
+
+@dataset_lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def get_sweep_figure(dataset: str, method: str, axis: str, model: Model) -> dict:
+    """ Animate the projections along an axis of the parameter grid, e.g. perplexity 10 -> 30 -> 50 at a fixed number
+        of iterations and learning rate
+
+    Each frame is the projection of a config, sliced out of the single float32 buffer of the projection store. The
+        projections of a sweep are aligned onto each other by prepare_results.py (see `procrustes_alignment`), so the
+        points don't jump around from a frame to the next one. All the frames are sent at once, and scrubbing through
+        them happens in the browser without calling the server.
+
+    :param dataset: Name of the dataset
+    :param method: Projection technique, i.e. "tsne" or "umap"
+    :param axis: Parameter animated (i.e. a field of the configs of the method)
+    :param model: Config of the grid holding the values of the fixed parameters
+    :return: The figure as a dictionary
+    """
+    grid = GRIDS[method]
+    store = get_projection_store(dataset, method)
+    labels = get_dataset(dataset).labels
+    rows = np.arange(len(labels))
+    if len(rows) > SWEEP_MAX_POINTS:
+        rows = np.sort(np.random.default_rng(0).choice(len(rows), SWEEP_MAX_POINTS, replace=False))
+    values = grid.axes[axis]
+    with METRICS.span("lookup", callback="update_sweep"):
+        frames = np.stack([store.at(grid.offset(model._replace(**{axis: value})))[rows] for value in values])
+    with METRICS.span("figure_build", callback="update_sweep"):
+        x_range, y_range = [
+            (frames[..., i].min() - margin, frames[..., i].max() + margin)
+            for i, margin in enumerate(0.05 * np.ptp(frames, axis=(0, 1)))
+        ]
+        fig = px.scatter(
+            x=frames[..., 0].ravel(),
+            y=frames[..., 1].ravel(),
+            **_label_colors(labels, np.tile(rows, len(values))),
+            animation_frame=np.repeat(values, len(rows)),
+            labels={"color": get_dataset(dataset).label_name.replace("_", " ").title(), "animation_frame": axis},
+            # Fixed ranges, so the axes don't rescale from a frame to the next one
+            range_x=x_range,
+            range_y=y_range,
+            render_mode="webgl" if len(rows) > WEBGL_THRESHOLD else "svg",
+        )
+    with METRICS.span("style", callback="update_sweep"):
+        fig = _update_plot_style(fig, len(rows))
+    with METRICS.span("serialization", callback="update_sweep"):
+        return json.loads(fig.to_json())
+
+
+register_cache("sweep_figure", get_sweep_figure)
+
+
+def _unavailable_figure(method: str) -> dict:
+    """ Placeholder of the plots of a method without projections for the dataset (see `get_methods`)
+
+    :return: The figure as a dictionary
+    """
+    title = {"tsne": "t-SNE", "umap": "UMAP"}[method]
+    return {"data": [], "layout": {"title": {"text": f"No {title} projections for this dataset"}}}
+
+
+def _snap(value: Union[int, float], step: Union[int, float]) -> Union[int, float]:
+    """ Round a slider value to its step, getting rid of floating-point noise (e.g. 0.15000000000000002)
+
+    :return:
+    """
+    return round(round(value / step) * step, 10)
+
+
+def _get_projection(dataset: str, method: str, model: Model) -> Optional[np.ndarray]:
+    """ Look up the projection of a config, either precomputed or fitted on demand
+
+    :return: The projection, or None if it isn't available (yet)
+    """
+    offset = GRIDS[method].offset(model)
+    if offset is not None:
+        return get_projection_store(dataset, method).at(offset)
+    return get_job_queue().get_result(dataset, method, model)
+
+
+def _slider_models(
+    perplexity: float, learning_rate: float, num_iterations: int, n_neighbors: int, min_dist: float
+) -> Tuple[TSNEobj, UMAPobj]:
+    """ The t-SNE and UMAP configs selected by the sliders
+
+    :return:
+    """
+    tsne_model = TSNEobj(
+        perplexity=_snap(perplexity, SLIDER_STEPS["perplexity"]),
+        num_iteration=_snap(num_iterations, SLIDER_STEPS["n_iterations"]),
+        learning_rate=_snap(learning_rate, SLIDER_STEPS["learning_rates"]),
+    )
+    umap_model = UMAPobj(
+        n_neighbors=_snap(n_neighbors, SLIDER_STEPS["n_neighbors"]),
+        min_dist=_snap(min_dist, SLIDER_STEPS["min_dist"]),
+    )
+    return tsne_model, umap_model
+
+
+def get_config_figure(dataset: str, method: str, model: Model) -> Tuple[dict, bool]:
+    """ Get the plot of a config, submitting its fit to the job queue if it isn't available
+
+    Until the fit is done, the plot of the nearest precomputed config is shown instead, with a note in the title.
+
+    :param dataset: Name of the dataset
+    :param method: Projection technique, i.e. "tsne" or "umap"
+    :param model: A `TSNEobj` or `UMAPobj` config
+    :return: The figure as a dictionary, and whether the fit of the config is still pending
+    """
+    grid = GRIDS[method]
+    offset = grid.offset(model)
+    if offset is not None:
+        return get_figure(dataset, method, offset), False
+
+    with METRICS.span("lookup"):
+        projection = get_job_queue().get_result(dataset, method, model)
+    if projection is not None:
+        with METRICS.span("labels"):
+            data = get_dataset(dataset)
+        fig = build_figure(projection, data)
+        fig.update_layout(uirevision=_uirevision(dataset, method, model))
+        return json.loads(fig.to_json()), False
+
+    get_job_queue().submit(dataset, method, model)
+    failed = get_job_queue().status(dataset, method, model) == FAILED
+    nearest_model = grid.nearest(model)
+    fig = get_figure(dataset, method, grid.offset(nearest_model))
+    params = ", ".join(f"{k}={v}" for k, v in nearest_model.to_dict().items() if k != "n_components")
+    note = "Fitting this config failed" if failed else "Fitting this config"
+    # Shallow copies, so the cached figure is left untouched
+    fig = {**fig, "layout": {**fig["layout"], "title": {"text": f"{note}... showing the nearest one ({params})"}}}
+    return fig, not failed
+
+
+def get_figure_source(app: dash.Dash, dataset: str, method: str, model: Model) -> Tuple[dict, bool]:
+    """ Where the browser gets the plot of a config from: the URL of a precomputed config (see `serve_figure`), or
+        the figure itself for the other ones
+
+    :return: {"url": ...} or {"figure": ...}, and whether the fit of the config is still pending
+    """
+    offset = GRIDS[method].offset(model)
+    if offset is not None:
+        METRICS.inc("dashboard_figure_requests_total", method=method, source="precomputed")
+        return {"url": figure_url(app, dataset, method, offset)}, False
+    fig, pending = get_config_figure(dataset, method, model)
+    METRICS.inc("dashboard_figure_requests_total", method=method, source="pending" if pending else "on_demand")
+    return {"figure": fig}, pending
+
+
+@dataset_lru_cache(maxsize=SPATIAL_INDEX_CACHE_SIZE, sizeof=lambda index: index.nbytes)
+def get_spatial_index(dataset: str, method: str, model: Model) -> GridIndex:
+    """ Build the spatial index of the projection of a config, which answers the hover, click and selection queries
+        of the plot without going through all its points
+
+    :param dataset: Name of the dataset
+    :param method: Projection technique, i.e. "tsne" or "umap"
+    :param model: A precomputed config, or one whose fit is done
+    :return:
+    """
+    projection = _get_projection(dataset, method, model)
+    if projection is None:
+        raise PreventUpdate
+    return GridIndex(projection)
+
+
+register_cache("spatial_index", get_spatial_index)
+
+
+def _spatial_index_in_view(dataset: str, method: str, model: Model) -> GridIndex:
+    """ Spatial index of the projection in view, i.e. the one of the nearest precomputed config while the fit of the
+        config is pending (see `get_config_figure`)
+
+    :return:
+    """
+    if method not in get_methods(dataset):
+        raise PreventUpdate
+    grid = GRIDS[method]
+    if model not in grid and get_job_queue().status(dataset, method, model) != DONE:
+        model = grid.nearest(model)
+    return get_spatial_index(dataset, method, model)
+
+
+def _points_table(dataset: str, index: GridIndex, rows: np.ndarray, dists: Optional[np.ndarray] = None) -> dbc.Table:
+    """ Table of the label and the coordinates of some points of a projection
+
+    :param dataset: Name of the dataset
+    :param index: Spatial index of the projection
+    :param rows: Rows of the points
+    :param dists: Distance of each point to the point of reference, if any
+    :return:
+    """
+    data = get_dataset(dataset)
+    table = pd.DataFrame(
+        {
+            "Row": rows,
+            data.label_name.replace("_", " ").title(): np.asarray(data.labels)[rows],
+            "x": np.round(index.points[rows, 0], 3),
+            "y": np.round(index.points[rows, 1], 3),
+        }
+    )
+    if dists is not None:
+        table["Distance"] = np.round(dists, 3)
+    return dbc.Table.from_dataframe(table, size="sm", striped=True)
+
+
+def selection_details(dataset: str, index: GridIndex, rows: np.ndarray) -> list:
+    """ Statistics of the points selected in a projection: their number, the count of each label among them, and the
+        first `SELECTION_TABLE_ROWS` of them
+
+    :param dataset: Name of the dataset
+    :param index: Spatial index of the projection
+    :param rows: Rows of the selected points
+    :return: The children of the selection card
+    """
+    if len(rows) == 0:
+        return [html.P("No point selected")]
+    labels = get_dataset(dataset).labels
+    counts = np.bincount(labels.codes[rows], minlength=len(labels.categories))
+    totals = np.bincount(labels.codes, minlength=len(labels.categories))
+    selected = counts > 0
+    label_stats = pd.DataFrame(
+        {
+            "Label": labels.categories[selected],
+            "Selected": counts[selected],
+            "Share of the selection": [f"{share:.1%}" for share in counts[selected] / len(rows)],
+            "Share of the label": [f"{share:.1%}" for share in counts[selected] / totals[selected]],
+        }
+    )
+    center = index.points[rows].mean(axis=0)
+    summary = (
+        f"{len(rows)} points selected ({len(rows) / len(index):.1%} of the dataset), "
+        f"centered at ({center[0]:.3f}, {center[1]:.3f})"
+    )
+    listed = f"First {SELECTION_TABLE_ROWS} points" if len(rows) > SELECTION_TABLE_ROWS else "Points"
+    return [
+        html.P(summary),
+        dbc.Table.from_dataframe(label_stats, size="sm", striped=True),
+        html.P(listed),
+        _points_table(dataset, index, rows[:SELECTION_TABLE_ROWS]),
+    ]
+
+
+def _zoom_ranges(relayout_data: Optional[dict]) -> Tuple[AxisRange, AxisRange]:
+    """ Extract the x and y ranges in view from the `relayoutData` of a graph
+
+    :param relayout_data: `relayoutData` property of a dcc.Graph
+    :return: The x and y ranges, or None for an axis that isn't zoomed in
+    """
+    relayout_data = relayout_data or {}
+    ranges = []
+    for axis in ["xaxis", "yaxis"]:
+        if f"{axis}.range[0]" in relayout_data:
+            ranges.append((relayout_data[f"{axis}.range[0]"], relayout_data[f"{axis}.range[1]"]))
+        elif f"{axis}.range" in relayout_data:
+            ranges.append(tuple(relayout_data[f"{axis}.range"]))
+        else:
+            ranges.append(None)
+    return ranges[0], ranges[1]
+
+
+def supports_clientside() -> bool:
+    """ Whether every dataset is small enough for the clientside callbacks (see `CLIENTSIDE_MAX_ROWS`)
+
+    The number of rows of a dataset is read from its projection stores, so the datasets aren't loaded.
+
+    :return:
+    """
+    for name, spec in get_registry().specs.items():
+        for method in GRIDS:
+            try:
+                n_rows = len(ProjectionStore(spec.results_dirpath(method)).at(0))
+            except OSError:
+                # Missing stores are reported when the dataset is loaded
+                continue
+            if n_rows > CLIENTSIDE_MAX_ROWS:
+                logger.warning(
+                    f"Dataset {name} has {n_rows} rows, more than the {CLIENTSIDE_MAX_ROWS} of the clientside callbacks"
+                )
+                return False
+    return True
+
+
+def projections_store_data(dataset: str) -> dict:
+    """ Pack every projection of a dataset into a compact payload for the clientside callbacks
+
+    For each method with projections, the projections are listed in the order of the parameter grid (see
+        `model_configs.ParamGrid`), so the browser finds a config from the position of each slider value along its axis.
+    The figure of the first config (of t-SNE, unless the dataset only has UMAP projections) is used as a template:
+        switching config only swaps the x/y of its traces, i.e. the rows of the projection belonging to the species of
+        each trace.
+
+    :param dataset: Name of the dataset
+    :return: A JSON-serializable dictionary
+    """
+    methods = get_methods(dataset)
+    figure = get_figure(dataset, methods[0], 0)
+    # Each trace is a class of labels, named after it (see `_label_classes`)
+    codes, names = _label_classes(get_dataset(dataset).labels)
+    classes = {name: code for code, name in enumerate(names)}
+    return {
+        "figure": figure,
+        "trace_rows": [np.flatnonzero(codes == classes[trace["name"]]).tolist() for trace in figure["data"]],
+        **{
+            method: {
+                "axes": list(GRIDS[method].axes.values()),
+                "projections": [
+                    np.round(get_projection_store(dataset, method).at(offset), 4).T.tolist()
+                    for offset in range(len(GRIDS[method]))
+                ],
+            }
+            for method in methods
+        },
+    }
+
+
+_GRAPH_OUTPUTS = [
+    Output("scatter-plot", "figure"),
+    Output("tsne-sliders", component_property="hidden"),
+    Output("umap-sliders", component_property="hidden"),
+    Output("tsne-button", "active"),
+    Output("umap-button", "active"),
+]
+_GRAPH_INPUTS = [
+    # Input("selected-method-radio-item", "value"),
+    Input("tsne-button", "n_clicks"),
+    Input("umap-button", "n_clicks"),
+    Input("slider-perplexity", "value"),
+    Input("slider-learning-rate", "value"),
+    Input("slider-num-iterations", "value"),
+    Input("slider-num-neighbors", "value"),
+    Input("slider-min-distance", "value"),
+    Input("scatter-plot", "relayoutData"),
+]
+
+
+# Dataset and config in view, e.g. for the callbacks triggered by the scatter plot itself
+_CONFIG_STATES = [
+    State("dataset-dropdown", "value"),
+    State("umap-button", "active"),
+    State("slider-perplexity", "value"),
+    State("slider-learning-rate", "value"),
+    State("slider-num-iterations", "value"),
+    State("slider-num-neighbors", "value"),
+    State("slider-min-distance", "value"),
+]
+
+
+def _generate_metric_callbacks(app: dash.Dash) -> None:
+    """ Callbacks of the heatmap of the quality metrics
 
     :param app:
     :return:
     """
+
+    # The metrics are precomputed, so the heatmap is cheap enough to stay server-side in both modes
     @app.callback(
+        Output("metric-heatmap", "figure"),
         [
-            Output("scatter-plot", "figure"),
-            Output("tsne-sliders", component_property="hidden"),
-            Output("umap-sliders", component_property="hidden"),
-            Output("tsne-button", "active"),
-            Output("umap-button", "active"),
+            Input("dataset-dropdown", "value"),
+            Input("metric-dropdown", "value"),
+            Input("umap-button", "active"),
+            Input("slider-perplexity", "value"),
+            Input("slider-learning-rate", "value"),
+            Input("slider-num-iterations", "value"),
+            Input("slider-num-neighbors", "value"),
+            Input("slider-min-distance", "value"),
         ],
+    )
+    def update_metric_heatmap(
+        dataset,
+        metric,
+        umap_active,
+        tsne_perplexity,
+        tsne_learning_rate,
+        tsne_num_iterations,
+        umap_num_neighbors,
+        umap_min_distance,
+    ):
+        tsne_model, umap_model = _slider_models(
+            tsne_perplexity, tsne_learning_rate, tsne_num_iterations, umap_num_neighbors, umap_min_distance
+        )
+        method, model = ("umap", umap_model) if umap_active else ("tsne", tsne_model)
+        if method not in get_methods(dataset):
+            return _unavailable_figure(method)
+        grid = GRIDS[method]
+        fields = list(grid.axes)
+        # Off-grid values of the fixed parameters are shown at the nearest value of the grid
+        nearest_model = grid.nearest(model)
+        fixed_positions = tuple(grid.axes[field].index(getattr(nearest_model, field)) for field in fields[1:-1])
+        fig = get_metric_heatmap(dataset, method, metric, fixed_positions)
+        if model not in grid:
+            return fig
+        # Outline the cell of the config in view (on a shallow copy, so the cached figure is left untouched)
+        marker = {
+            "type": "scatter",
+            "x": [str(getattr(model, fields[-1]))],
+            "y": [str(getattr(model, fields[0]))],
+            "mode": "markers",
+            "marker": {"symbol": "square-open", "size": 40, "color": "red", "line": {"width": 3}},
+            "hoverinfo": "skip",
+            "showlegend": False,
+        }
+        return {**fig, "data": [*fig["data"], marker]}
+
+
+def _generate_sweep_callbacks(app: dash.Dash) -> None:
+    """ Callbacks of the animated sweep
+
+    :param app:
+    :return:
+    """
+
+    @app.callback(
+        [Output("sweep-axis-dropdown", "options"), Output("sweep-axis-dropdown", "value")],
+        Input("umap-button", "active"),
+    )
+    def update_sweep_axes(umap_active):
+        titles = dict(SLIDER_PARAMS.values())
+        axes = list(GRIDS["umap" if umap_active else "tsne"].axes)
+        return [{"label": titles[axis], "value": axis} for axis in axes], axes[0]
+
+    # A new animation is only needed when the fixed parameters change: the frames of every value of the animated one
+    #   are already in the browser
+    @app.callback(
+        Output("sweep-plot", "figure"),
         [
-            # Input("selected-method-radio-item", "value"),
-            Input("tsne-button", "n_clicks"),
-            Input("umap-button", "n_clicks"),
+            Input("dataset-dropdown", "value"),
+            Input("sweep-axis-dropdown", "value"),
             Input("slider-perplexity", "value"),
             Input("slider-learning-rate", "value"),
             Input("slider-num-iterations", "value"),
             Input("slider-num-neighbors", "value"),
             Input("slider-min-distance", "value"),
         ],
+        State("umap-button", "active"),
+    )
+    def update_sweep(
+        dataset,
+        axis,
+        tsne_perplexity,
+        tsne_learning_rate,
+        tsne_num_iterations,
+        umap_num_neighbors,
+        umap_min_distance,
+        umap_active,
+    ):
+        method = "umap" if umap_active else "tsne"
+        grid = GRIDS[method]
+        changed_id = [p["prop_id"] for p in callback_context.triggered][0]
+        param, _ = SLIDER_PARAMS.get(changed_id.split(".")[0], (None, None))
+        # Nothing changes when the slider of the animated parameter (or of the other method) moves
+        if axis not in grid.axes or (param is not None and (param == axis or param not in grid.axes)):
+            raise PreventUpdate
+        if method not in get_methods(dataset):
+            return _unavailable_figure(method)
+        tsne_model, umap_model = _slider_models(
+            tsne_perplexity, tsne_learning_rate, tsne_num_iterations, umap_num_neighbors, umap_min_distance
+        )
+        # Only the configs of the grid are precomputed, and the animated parameter starts at its first value
+        model = grid.nearest(umap_model if umap_active else tsne_model)
+        return get_sweep_figure(dataset, method, axis, model._replace(**{axis: grid.axes[axis][0]}))
+
+
+def _generate_point_detail_callbacks(app: dash.Dash) -> None:
+    """ Callbacks of the details of the points hovered, clicked or selected in the plot
+
+    :param app:
+    :return:
+    """
+
+    # The details of the points are queried server-side in both modes, from the spatial index of the projection in view
+    @app.callback(Output("hover-detail", "children"), Input("scatter-plot", "hoverData"), _CONFIG_STATES)
+    def show_hover(
+        hover_data,
+        dataset,
+        umap_active,
+        tsne_perplexity,
+        tsne_learning_rate,
+        tsne_num_iterations,
+        umap_num_neighbors,
+        umap_min_distance,
+    ):
+        if not hover_data:
+            raise PreventUpdate
+        tsne_model, umap_model = _slider_models(
+            tsne_perplexity, tsne_learning_rate, tsne_num_iterations, umap_num_neighbors, umap_min_distance
+        )
+        method, model = ("umap", umap_model) if umap_active else ("tsne", tsne_model)
+        with METRICS.span("lookup", callback="show_hover"):
+            index = _spatial_index_in_view(dataset, method, model)
+        # The point under the cursor, or the nearest one to the center of a bin of a density heatmap
+        point = hover_data["points"][0]
+        with METRICS.span("query", callback="show_hover"):
+            rows, _ = index.nearest(point["x"], point["y"])
+        return _points_table(dataset, index, rows)
+
+    @app.callback(
+        Output("selection-detail", "children"),
+        [Input("scatter-plot", "clickData"), Input("scatter-plot", "selectedData")],
+        _CONFIG_STATES,
+    )
+    def show_selection(
+        click_data,
+        selected_data,
+        dataset,
+        umap_active,
+        tsne_perplexity,
+        tsne_learning_rate,
+        tsne_num_iterations,
+        umap_num_neighbors,
+        umap_min_distance,
+    ):
+        changed_id = [p["prop_id"] for p in callback_context.triggered][0]
+        clicked = changed_id == "scatter-plot.clickData" and bool(click_data)
+        # Box selections come with the range of each axis, lasso selections with the vertices of the lasso
+        selection = (selected_data or {}).get("range") or (selected_data or {}).get("lassoPoints")
+        if not clicked and (changed_id != "scatter-plot.selectedData" or selection is None):
+            return _SELECTION_HINT
+        tsne_model, umap_model = _slider_models(
+            tsne_perplexity, tsne_learning_rate, tsne_num_iterations, umap_num_neighbors, umap_min_distance
+        )
+        method, model = ("umap", umap_model) if umap_active else ("tsne", tsne_model)
+        with METRICS.span("lookup", callback="show_selection"):
+            index = _spatial_index_in_view(dataset, method, model)
+
+        if clicked:
+            point = click_data["points"][0]
+            with METRICS.span("query", callback="show_selection"):
+                rows, dists = index.nearest(point["x"], point["y"], k=CLICK_NEIGHBORS + 1)
+            labels = np.asarray(get_dataset(dataset).labels)
+            return [
+                html.P(f"Row {rows[0]} and its {len(rows) - 1} nearest neighbors in the projection"),
+                html.P(f"{(labels[rows[1:]] == labels[rows[0]]).mean():.0%} of the neighbors have the same label"),
+                _points_table(dataset, index, rows, dists),
+            ]
+        with METRICS.span("query", callback="show_selection"):
+            if "range" in selected_data:
+                rows = index.box(tuple(sorted(selection["x"])), tuple(sorted(selection["y"])))
+            else:
+                rows = index.lasso(selection["x"], selection["y"])
+        return selection_details(dataset, index, rows)
+
+
+def generate_callbacks(app: dash.Dash, clientside: bool = False) -> None:
+    """The main function to generate all necessary callbacks for the interactive dashboard
+
+    :param app:
+    :param clientside: Whether to switch configs in the browser (see `assets/clientside.js`) instead of calling the
+        server on every slider move. The layout must then be generated with `clientside=True` as well.
+    :return:
+    """
+
+    # The dataset is selected either in the dropdown or by the `dataset` query parameter of the URL, and both are kept
+    #   in sync, e.g. so that a link to the dashboard opens the same dataset
+    @app.callback(
+        [Output("dataset-dropdown", "value"), Output("url", "search")],
+        [Input("dataset-dropdown", "value"), Input("url", "search")],
     )
+    def sync_dataset(dataset, search):
+        changed_id = [p["prop_id"] for p in callback_context.triggered][0]
+        if changed_id == "dataset-dropdown.value":
+            return no_update, f"?{urlencode({'dataset': dataset})}"
+        registry = get_registry()
+        url_dataset = parse_qs((search or "").lstrip("?")).get("dataset", [registry.default])[0]
+        if url_dataset not in registry or url_dataset == dataset:
+            return no_update, no_update
+        return url_dataset, no_update
+
+    # A dataset may lack the projections of a method, e.g. t-SNE for a dataset precomputed in out-of-core mode
+    @app.callback(
+        [Output("tsne-button", "disabled"), Output("umap-button", "disabled")],
+        Input("dataset-dropdown", "value"),
+    )
+    def update_method_buttons(dataset):
+        methods = get_methods(dataset)
+        return "tsne" not in methods, "umap" not in methods
+
+    _generate_metric_callbacks(app)
+    _generate_sweep_callbacks(app)
+    _generate_point_detail_callbacks(app)
+
+    if clientside:
+        # The projections of a dataset are sent once, when it's selected
+        @app.callback(Output("projections-store", "data"), Input("dataset-dropdown", "value"))
+        @METRICS.callback("update_projections_store")
+        def update_projections_store(dataset):
+            return projections_store_data(dataset)
+
+        app.clientside_callback(
+            ClientsideFunction(namespace="projections", function_name="update_graph"),
+            _GRAPH_OUTPUTS,
+            _GRAPH_INPUTS + [Input("projections-store", "data")],
+            [State("umap-button", "active")],
+        )
+        return
+
+    # Under the same prefix as the routes of Dash, which `figure_url` links to through `get_relative_path`
+    app.server.add_url_rule(
+        f"{app.config.routes_pathname_prefix}{FIGURES_URL_PATH[1:]}/<dataset>/<method>/<int:offset>/<digest>.json",
+        view_func=serve_figure,
+    )
+    # The figure is fetched by the browser from the source set by `add_graph`, so it goes through the HTTP cache
+    app.clientside_callback(
+        ClientsideFunction(namespace="projections", function_name="fetch_figure"),
+        Output("scatter-plot", "figure"),
+        Input("figure-source", "data"),
+    )
+
+    @app.callback(
+        [Output("figure-source", "data")] + _GRAPH_OUTPUTS[1:] + [Output("job-poll", "disabled")],
+        _GRAPH_INPUTS + [Input("dataset-dropdown", "value"), Input("job-poll", "n_intervals")],
+        [State("umap-button", "active")],
+    )
+    @METRICS.callback("add_graph")
     def add_graph(
         tsne_button,
         umap_button,
@@ -341,35 +1406,67 @@ def generate_callbacks(app: dash.Dash) -> None:
         tsne_num_iterations,
         umap_num_neighbors,
         umap_min_distance,
+        relayout_data,
+        dataset,
+        job_poll_intervals,
+        umap_active,
     ):
         # Even thought tsne_button and umap_button input arguments are not explictly used in this function,
         #   however, they should be present in order to trigger this callback whenever they are clicked,
         #   and hence, they will be present in the callback_context as an element that was changed!
         changed_id = [p["prop_id"] for p in callback_context.triggered][0]
+        tsne_model, umap_model = _slider_models(
+            tsne_perplexity, tsne_learning_rate, tsne_num_iterations, umap_num_neighbors, umap_min_distance
+        )
+        method, model = ("umap", umap_model) if umap_active else ("tsne", tsne_model)
 
-        if "umap-button" in changed_id:
-            proj_results = UMAP_PROJECTION_RESULTS[
-                f"n_comp=2__n_neigh={umap_num_neighbors}__min_dist={umap_min_distance:.1f}"
-            ]["proj"]
+        if "scatter-plot" in changed_id:
+            # Selecting points (see `show_selection`) doesn't change the view
+            if not any(key.startswith(("xaxis", "yaxis")) for key in relayout_data or {}):
+                raise PreventUpdate
+            # Zooming/panning only needs new data when the projection in view is aggregated into a density heatmap.
+            #   Otherwise, all the points are already in the figure.
+            projection = _get_projection(dataset, method, model)
+            if projection is None or len(projection) <= DENSITY_THRESHOLD:
+                raise PreventUpdate
+            x_range, y_range = _zoom_ranges(relayout_data)
+            if x_range is None and y_range is None:
+                source, _ = get_figure_source(app, dataset, method, model)
+            else:
+                fig = build_figure(projection, get_dataset(dataset), x_range, y_range)
+                fig.update_layout(uirevision=_uirevision(dataset, method, model))
+                source = {"figure": fig.to_plotly_json()}
+            return source, no_update, no_update, no_update, no_update, no_update
+
+        if "job-poll" in changed_id:
+            # Keep polling until the fit of the config in view is done
+            source, pending = get_figure_source(app, dataset, method, model)
+            if pending:
+                raise PreventUpdate
+            return source, no_update, no_update, no_update, no_update, True
+
+        show_umap = "umap-button" in changed_id or (umap_active and ("slider" in changed_id or "dataset" in changed_id))
+        # The method without projections for the dataset (if any) can't be shown, and its button is disabled
+        methods = get_methods(dataset)
+        if "tsne" not in methods:
+            show_umap = True
+        elif "umap" not in methods:
+            show_umap = False
+        if show_umap:
+            source, pending = get_figure_source(app, dataset, "umap", umap_model)
             hide_tsne_params_box, hide_umap_params_box = True, False
             tsne_button_active, umap_button_active = False, True
         else:
             # By default, it's t-SNE
-            proj_results = TSNE_PROJECTION_RESULTS[
-                f"n_comp=2__perp={tsne_perplexity}__n_iter={tsne_num_iterations}__learning_rate={tsne_learning_rate}"
-            ]["proj"]
+            source, pending = get_figure_source(app, dataset, "tsne", tsne_model)
             hide_tsne_params_box, hide_umap_params_box = False, True
             tsne_button_active, umap_button_active = True, False
 
-        df = px.data.iris()
-        fig = px.scatter(
-            proj_results, x=0, y=1, color=df.species, labels={"color": "Species"}
-        )
-
         return (
-            _update_plot_style(fig),
+            source,
             hide_tsne_params_box,
             hide_umap_params_box,
             tsne_button_active,
             umap_button_active,
+            not pending,
         )
@@ -0,0 +1,216 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datasets import DATASET_PATH, LABEL_COLUMN, LABELS_PATH, Dataset, load_dataset
+from model_configs import GRIDS
+from os import environ
+from projection_store import INDEX_FILENAME, ProjectionStore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DATA_DIR = Path(".")
+# Datasets served by the dashboard, see `load_dataset_specs`
+REGISTRY_PATH = Path(environ.get("DATASET_REGISTRY_PATH", DATA_DIR.joinpath("datasets.json")))
+# Memory budget of the datasets loaded by a process, including the objects cached along with them (e.g. their figures).
+#   Beyond it, the least recently used datasets are evicted.
+MEMORY_BUDGET_MB = float(environ.get("DATASET_MEMORY_BUDGET_MB", 1024))
+
+# Directory of the projection store of each method, within the results directory of a dataset
+PROJECTIONS_DIRNAMES = {"tsne": "tsne_projections", "umap": "umap_projections"}
+
+
+class DatasetSpec(NamedTuple):
+    path: Optional[str] = None  # None means the Iris data
+    label_column: str = LABEL_COLUMN
+    labels_path: Optional[str] = None  # Only for .npy datasets
+    results_dir: str = str(DATA_DIR)  # Directory of the projection stores, see `prepare_results.py --results-dir`
+
+    def results_dirpath(self, method: str) -> Path:
+        return Path(self.results_dir).joinpath(PROJECTIONS_DIRNAMES[method])
+
+    def load(self, features: bool = True) -> Dataset:
+        return load_dataset(self.path, self.label_column, labels_filepath=self.labels_path, features=features)
+
+
+def load_dataset_specs(registry_path: Path = REGISTRY_PATH) -> Dict[str, DatasetSpec]:
+    """Read the registry of the datasets, a JSON file such as
+
+        {
+            "iris": {},
+            "mnist": {"path": "data/mnist.npy", "labels_path": "data/mnist_labels.npy", "results_dir": "data/mnist"}
+        }
+
+    where every field of a dataset is optional (see `DatasetSpec`), and paths are relative to the `app/` directory.
+    Without a registry, the only dataset is the one of `DATASET_PATH` (the Iris data by default).
+
+    :param registry_path: Path of the registry
+    :return: The spec of each dataset, by name. The first one is the default dataset.
+    """
+    if not Path(registry_path).exists():
+        name = "iris" if DATASET_PATH is None else Path(DATASET_PATH).stem
+        return {name: DatasetSpec(DATASET_PATH, LABEL_COLUMN, LABELS_PATH)}
+    with open(registry_path) as f:
+        specs = {name: DatasetSpec(**spec) for name, spec in json.load(f).items()}
+    if not specs:
+        raise ValueError(f"No dataset in {registry_path}")
+    return specs
+
+
+class LoadedDataset:
+    """Labels and projection stores of a dataset, as loaded in memory by `DatasetRegistry`, along with the objects
+        derived from them by the dashboard (e.g. its figures, see `cached`)
+
+    The projections are memory-mapped, so `nbytes` is an upper bound of their memory: the pages of a store are only
+        read once they're accessed.
+    A dataset may lack the store of a method, e.g. the t-SNE one of a dataset precomputed in out-of-core mode. Its
+        `methods` are the ones with a store.
+    """
+
+    def __init__(self, name: str, spec: DatasetSpec):
+        self.name = name
+        # The dashboard doesn't need the features
+        self.dataset = spec.load(features=False)
+        self._stores = {}
+        for method in GRIDS:
+            directory = spec.results_dirpath(method)
+            if not directory.joinpath(INDEX_FILENAME).exists():
+                logger.info(f"No {method} projections for dataset {name} in {directory}")
+                continue
+            self._stores[method] = ProjectionStore(directory)
+            # Configs are looked up by their offset in the parameter grid, i.e. their position in the store
+            if list(self._stores[method]) != [model.get_properties_str() for model in GRIDS[method]]:
+                raise ValueError(
+                    f"The configs of {directory} don't match the parameter grid of {method}, run prepare_results.py again"
+                )
+            # E.g. the store of another dataset left in the same results directory
+            if len(self._stores[method].at(0)) != len(self.dataset.labels):
+                raise ValueError(
+                    f"The projections of {directory} don't have one row per sample of dataset {name}, "
+                    "run prepare_results.py again"
+                )
+        if not self._stores:
+            raise FileNotFoundError(f"No projections for dataset {name}, run prepare_results.py first")
+        # Cached objects and their memory, by cache name and key (see `cached`)
+        self._caches: Dict[str, "OrderedDict[Hashable, Tuple[Any, int]]"] = {}
+        self._cache_lock = threading.Lock()
+
+    @property
+    def methods(self) -> List[str]:
+        return list(self._stores)
+
+    def store(self, method: str) -> ProjectionStore:
+        if method not in self._stores:
+            raise FileNotFoundError(f"No {method} projections for dataset {self.name}")
+        return self._stores[method]
+
+    def cached(
+        self, name: str, key: Hashable, build: Callable[[], Any], maxsize: int, sizeof: Callable[[Any], int]
+    ) -> Tuple[Any, bool]:
+        """Get an object derived from the dataset, e.g. a figure, building it on a cache miss
+
+        The objects are cached with the dataset rather than by the process, so they're evicted along with it, and
+            their memory counts towards the budget of the registry. Each cache keeps its `maxsize` most recently used
+            objects.
+
+        :param name: Name of the cache
+        :param key: Key of the object within the cache
+        :param build: Function building the object
+        :param maxsize: Maximum number of objects of the cache
+        :param sizeof: Memory of an object, in bytes
+        :return: The object, and whether it was cached
+        """
+        with self._cache_lock:
+            cache = self._caches.setdefault(name, OrderedDict())
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key][0], True
+        # Built outside of the lock, so the other objects can still be looked up in the meantime
+        value = build()
+        nbytes = sizeof(value)
+        with self._cache_lock:
+            cache[key] = (value, nbytes)
+            while len(cache) > maxsize:
+                cache.popitem(last=False)
+        return value, False
+
+    def cache_size(self, name: str) -> int:
+        with self._cache_lock:
+            return len(self._caches.get(name, ()))
+
+    def clear_cache(self, name: str) -> None:
+        with self._cache_lock:
+            self._caches.pop(name, None)
+
+    @property
+    def nbytes(self) -> int:
+        labels = self.dataset.labels
+        labels_nbytes = labels.codes.nbytes + int(labels.categories.memory_usage(deep=True))
+        with self._cache_lock:
+            cached_nbytes = sum(nbytes for cache in self._caches.values() for _, nbytes in cache.values())
+        return labels_nbytes + sum(store.nbytes for store in self._stores.values()) + cached_nbytes
+
+
+class DatasetRegistry:
+    """Datasets served by a process, loaded on first access and evicted (least recently used first) beyond a memory
+        budget, so the memory of a process stays flat whatever the number of datasets of the registry
+
+    The registry is thread-safe. An evicted dataset is simply loaded again the next time it's accessed, and the objects
+        cached along with it (see `LoadedDataset.cached`) are built again.
+    """
+
+    def __init__(self, specs: Dict[str, DatasetSpec], memory_budget_mb: float = MEMORY_BUDGET_MB):
+        """
+        :param specs: Spec of each dataset, by name (see `load_dataset_specs`)
+        :param memory_budget_mb: Memory budget of the loaded datasets, in MB. The dataset in use is never evicted, even
+            if it doesn't fit in the budget on its own.
+        """
+        self.specs = specs
+        self.memory_budget = int(memory_budget_mb * 2**20)
+        self._loaded: "OrderedDict[str, LoadedDataset]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def default(self) -> str:
+        return next(iter(self.specs))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def get(self, name: str) -> LoadedDataset:
+        """Get a dataset, loading it (and evicting the least recently used ones beyond the budget) if needed
+
+        :param name: Name of the dataset
+        :return:
+        """
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+            else:
+                logger.info(f"Loading dataset {name}")
+                self._loaded[name] = LoadedDataset(name, self.specs[name])
+            # The cached objects of the datasets grow after they're loaded, so the budget is checked on every access
+            while len(self._loaded) > 1 and sum(d.nbytes for d in self._loaded.values()) > self.memory_budget:
+                evicted, _ = self._loaded.popitem(last=False)
+                logger.info(f"Evicted dataset {evicted}")
+            return self._loaded[name]
+
+    def loaded(self) -> List[LoadedDataset]:
+        with self._lock:
+            return list(self._loaded.values())
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Memory of each loaded dataset, in bytes
+
+        :return:
+        """
+        with self._lock:
+            return {name: loaded.nbytes for name, loaded in self._loaded.items()}
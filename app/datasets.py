@@ -0,0 +1,181 @@
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from dataclasses import dataclass
+from os import environ
+from pandas.api.types import union_categoricals
+
+# Dataset used by both the precompute job and the dashboard. Without a path, it's the Iris data.
+DATASET_PATH = environ.get("DATASET_PATH")
+LABEL_COLUMN = environ.get("DATASET_LABEL_COLUMN", "species")
+LABELS_PATH = environ.get("DATASET_LABELS_PATH")  # Only for .npy datasets
+
+# Number of rows read at once from CSV and Parquet files
+CHUNK_SIZE = 100_000
+
+
+@dataclass
+class Dataset:
+    features: Optional[np.ndarray]  # float32 array of shape (n_samples, n_features), None if not loaded
+    labels: pd.Categorical
+    label_name: str
+
+
+def _read_table_chunks(filepath: Path, columns: Optional[List[str]], chunk_size: int):
+    if filepath.suffix == ".csv":
+        yield from pd.read_csv(filepath, usecols=columns, chunksize=chunk_size)
+    elif filepath.suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow: `pip install pyarrow`")
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported dataset format: {filepath.suffix}")
+
+
+def _table_chunks(
+    filepath: Path, label_column: str, feature_columns: Optional[List[str]], features: bool, chunk_size: int
+) -> Iterator[Tuple[Optional[np.ndarray], pd.Categorical]]:
+    columns = None if features and feature_columns is None else [label_column, *(feature_columns or [])]
+    for chunk in _read_table_chunks(filepath, columns, chunk_size):
+        labels = pd.Categorical(chunk[label_column])
+        feature_chunk = None
+        if features:
+            chunk = chunk.drop(columns=label_column)
+            if feature_columns is None:
+                chunk = chunk.select_dtypes("number")
+            feature_chunk = chunk[feature_columns or chunk.columns].to_numpy(dtype=np.float32)
+        yield feature_chunk, labels
+
+
+def _load_table(
+    filepath: Path, label_column: str, feature_columns: Optional[List[str]], features: bool, chunk_size: int
+) -> Dataset:
+    """Read a CSV or Parquet table chunk by chunk, so the whole table (e.g. as float64) is never held in memory
+
+    :return:
+    """
+    feature_chunks, label_chunks = [], []
+    for feature_chunk, labels in _table_chunks(filepath, label_column, feature_columns, features, chunk_size):
+        feature_chunks.append(feature_chunk)
+        label_chunks.append(labels)
+    return Dataset(
+        features=np.concatenate(feature_chunks) if features else None,
+        labels=union_categoricals(label_chunks),
+        label_name=label_column,
+    )
+
+
+def _load_feature_array(filepath: Path) -> np.ndarray:
+    if filepath.suffix == ".npz":
+        with np.load(filepath, allow_pickle=False) as arrays:
+            return arrays["features"].astype(np.float32, copy=False)
+    return np.load(filepath, mmap_mode="r")
+
+
+def _load_arrays(filepath: Path, labels_filepath: Optional[Path], label_column: str, features: bool) -> Dataset:
+    """Load features from a `.npy` file (memory-mapped) or from the "features" array of a `.npz` file
+
+    Labels come from the "labels" array of the `.npz` file, or from `labels_filepath` (`.npy`) for a `.npy` file.
+
+    :return:
+    """
+    if filepath.suffix == ".npz":
+        with np.load(filepath, allow_pickle=False) as arrays:
+            labels = arrays["labels"]
+    else:
+        if labels_filepath is None:
+            raise ValueError(f"Labels of {filepath} must be given in a separate .npy file")
+        labels = np.load(labels_filepath, allow_pickle=False)
+    feature_array = _load_feature_array(filepath) if features else None
+    return Dataset(features=feature_array, labels=pd.Categorical(labels), label_name=label_column)
+
+
+def load_dataset(
+    filepath: Optional[Union[str, Path]] = DATASET_PATH,
+    label_column: str = LABEL_COLUMN,
+    feature_columns: Optional[List[str]] = None,
+    labels_filepath: Optional[Union[str, Path]] = LABELS_PATH,
+    features: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dataset:
+    """Load the features and labels of a dataset
+
+    Supported formats are CSV and Parquet tables (read chunk by chunk), and NumPy `.npy`/`.npz` files.
+    Labels are kept as a categorical array (i.e. small integer codes), which is compact enough to stay in memory.
+
+    :param filepath: Path of the dataset. None means the Iris data.
+    :param label_column: Column of the labels in a table (also used as the name of the labels)
+    :param feature_columns: Columns of the features in a table. Defaults to all the numeric columns but the labels.
+    :param labels_filepath: Path of the labels (`.npy`) of a `.npy` dataset
+    :param features: Whether to load the features. The dashboard only needs the labels.
+    :param chunk_size: Number of rows read at once from a table
+    :return:
+    """
+    if filepath is None:
+        df = px.data.iris()
+        feature_array = None
+        if features:
+            feature_array = df[feature_columns or ["sepal_length", "sepal_width", "petal_length", "petal_width"]]
+            feature_array = feature_array.to_numpy(dtype=np.float32)
+        return Dataset(features=feature_array, labels=pd.Categorical(df[label_column]), label_name=label_column)
+
+    filepath = Path(filepath)
+    if filepath.suffix in (".npy", ".npz"):
+        return _load_arrays(filepath, labels_filepath and Path(labels_filepath), label_column, features)
+    return _load_table(filepath, label_column, feature_columns, features, chunk_size)
+
+
+def iter_feature_chunks(
+    filepath: Optional[Union[str, Path]] = DATASET_PATH,
+    label_column: str = LABEL_COLUMN,
+    feature_columns: Optional[List[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[np.ndarray]:
+    """Stream the features of a dataset chunk by chunk, without ever holding all of them in memory
+
+    `.npy` datasets are memory-mapped, so only the pages of the current chunk are read. Parameters are the same as
+        for `load_dataset`.
+
+    :return: An iterator over float32 arrays of at most `chunk_size` rows, in the order of the dataset
+    """
+    if filepath is not None and Path(filepath).suffix not in (".npy", ".npz"):
+        for feature_chunk, _ in _table_chunks(Path(filepath), label_column, feature_columns, True, chunk_size):
+            yield feature_chunk
+        return
+
+    if filepath is None:
+        feature_array = load_dataset(None, label_column, feature_columns).features
+    else:
+        feature_array = _load_feature_array(Path(filepath))
+    for start in range(0, len(feature_array), chunk_size):
+        yield np.asarray(feature_array[start : start + chunk_size], dtype=np.float32)
+
+
+def sample_features(n_samples: int, seed: int, **kwargs) -> Tuple[np.ndarray, int]:
+    """Draw a uniform random sample of the rows of a dataset in a single streaming pass
+
+    Every row gets a random key, and only the rows with the `n_samples` smallest keys seen so far are kept, so the
+        memory used is bounded by the size of the sample plus one chunk.
+
+    :param n_samples: Size of the sample
+    :param seed: Seed of the random keys
+    :param kwargs: Keyword arguments of `iter_feature_chunks` selecting the dataset
+    :return: The sample (rows in the order of the dataset) and the total number of rows of the dataset
+    """
+    rng = np.random.default_rng(seed)
+    sample, keys, n_rows = np.empty((0, 0), dtype=np.float32), np.empty(0), 0
+    for feature_chunk in iter_feature_chunks(**kwargs):
+        sample = np.concatenate([sample, feature_chunk]) if n_rows else feature_chunk
+        keys = np.concatenate([keys, rng.random(len(feature_chunk))])
+        n_rows += len(feature_chunk)
+        if len(sample) > n_samples:
+            # Sorting the kept positions preserves the order of the rows
+            keep = np.sort(np.argpartition(keys, n_samples)[:n_samples])
+            sample, keys = sample[keep], keys[keep]
+    return sample, n_rows
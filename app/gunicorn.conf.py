@@ -0,0 +1,29 @@
+from os import environ
+
+import multiprocessing
+
+# Production server of the app: `gunicorn --config gunicorn.conf.py app:server` from the `app/` directory
+
+bind = f"0.0.0.0:{environ.get('PORT', 8000)}"
+
+# Callbacks are CPU-bound (building figures), so throughput scales with the number of worker processes. Threads
+#   mostly help with slow clients and the I/O of the on-demand job queue.
+workers = int(environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(environ.get("GUNICORN_THREADS", 2))
+timeout = int(environ.get("GUNICORN_TIMEOUT", 60))
+
+# The app is imported once by the master process and the workers are forked from it, so they share its memory
+#   copy-on-write rather than loading everything again
+preload_app = True
+
+accesslog = environ.get("GUNICORN_ACCESS_LOG")  # e.g. "-" for stdout
+errorlog = "-"
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before the workers are forked: the labels and the
+    #   (memory-mapped) projections are loaded once and shared by all the workers
+    from dashboard import load_data
+
+    load_data()
+    server.log.info("Projection data loaded")
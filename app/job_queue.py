@@ -0,0 +1,258 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import numpy as np
+import sqlite3
+import time
+import traceback
+from contextlib import closing
+from functools import lru_cache
+from os import environ
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DATA_DIR = Path(".")
+QUEUE_DB_PATH = Path(environ.get("JOB_QUEUE_PATH", DATA_DIR.joinpath(".job_queue.sqlite")))
+# Maximum number of on-demand projections kept in the shared cache. The least recently used ones are evicted first.
+MAX_CACHED_RESULTS = int(environ.get("JOB_QUEUE_MAX_RESULTS", 256))
+# Seconds a worker waits before looking for new jobs when the queue is empty
+POLL_INTERVAL = 0.5
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+# Queues of an older schema are dropped (they only hold a cache of on-demand fits)
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    method TEXT NOT NULL,
+    model TEXT NOT NULL,
+    status TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    projection BLOB NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at);
+CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+"""
+
+
+class JobQueue:
+    """SQLite-backed queue of on-demand fits, shared by the dashboard processes and the workers
+
+    The dashboard submits the configs that aren't precomputed, the workers (`python job_queue.py`) fit them, and the
+        projections go into a shared cache of at most `max_results` entries with LRU eviction.
+    A new connection is opened for every operation, so a queue can be used from any thread or process.
+    """
+
+    def __init__(self, db_path: Path = QUEUE_DB_PATH, max_results: int = MAX_CACHED_RESULTS):
+        self.db_path = Path(db_path)
+        self.max_results = max_results
+        with closing(self._connect()) as conn:
+            # WAL lets the dashboard read while a worker writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS jobs; DROP TABLE IF EXISTS results;")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def job_key(dataset: str, method: str, model) -> str:
+        return f"{dataset}/{method}/{model.get_properties_str()}"
+
+    def submit(self, dataset: str, method: str, model) -> None:
+        """Queue the fit of a config, unless it's already queued, running or done
+
+        :param dataset: Name of the dataset (see `dataset_registry.load_dataset_specs`)
+        :param method: Projection technique, i.e. "tsne" or "umap"
+        :param model: A `TSNEobj` or `UMAPobj` config
+        :return:
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (key, dataset, method, model, status, submitted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.job_key(dataset, method, model),
+                    dataset,
+                    method,
+                    json.dumps(model.to_dict()),
+                    PENDING,
+                    time.time(),
+                ),
+            )
+
+    def status(self, dataset: str, method: str, model) -> Optional[str]:
+        key = self.job_key(dataset, method, model)
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE key = ?", (key,)).fetchone()
+        return row and row[0]
+
+    def get_result(self, dataset: str, method: str, model) -> Optional[np.ndarray]:
+        """Look up the projection of a config in the shared cache
+
+        :return: The projection, or None if it hasn't been computed (or has been evicted)
+        """
+        key = self.job_key(dataset, method, model)
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT projection FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        return np.load(io.BytesIO(row[0]), allow_pickle=False)
+
+    def claim(self) -> Optional[Tuple[str, str, str, dict]]:
+        """Atomically take the oldest pending job, so every job is run by a single worker
+
+        :return: The key, dataset, method and model parameters of the job, or None if the queue is empty
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT key, dataset, method, model FROM jobs WHERE status = ? ORDER BY submitted_at LIMIT 1",
+                (PENDING,),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = ? WHERE key = ?", (RUNNING, row[0]))
+            conn.execute("COMMIT")
+        return row and (row[0], row[1], row[2], json.loads(row[3]))
+
+    def complete(self, key: str, projection: np.ndarray) -> None:
+        """Store the projection of a job in the shared cache, evicting the least recently used ones beyond capacity
+
+        :return:
+        """
+        buffer = io.BytesIO()
+        np.save(buffer, projection.astype(np.float32), allow_pickle=False)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, projection, last_access) VALUES (?, ?, ?)",
+                (key, buffer.getvalue(), time.time()),
+            )
+            conn.execute("UPDATE jobs SET status = ? WHERE key = ?", (DONE, key))
+            # Evicted results get their job deleted as well, so they can be submitted again
+            evicted = conn.execute(
+                "SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_results,)
+            ).fetchall()
+            conn.executemany("DELETE FROM results WHERE key = ?", evicted)
+            conn.executemany("DELETE FROM jobs WHERE key = ?", evicted)
+            conn.execute("COMMIT")
+
+    def fail(self, key: str, error: str) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ? WHERE key = ?", (FAILED, error, key))
+
+    def requeue_running(self) -> None:
+        """Put the jobs left running by workers that died back in the queue
+
+        :return:
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (PENDING, RUNNING))
+
+
+def _work(db_path: Path) -> None:
+    """Main loop of a worker process: run the pending jobs of the queue, one at a time
+
+    :return:
+    """
+    # The compute path is only imported by the workers, never by the dashboard
+    from dataset_registry import load_dataset_specs
+    from model_configs import GRIDS
+    from prepare_results import (
+        TSNEobj,
+        UMAPobj,
+        _fit_tsne,
+        _fit_umap,
+        _prepare_tsne_inputs,
+        _prepare_umap_inputs,
+        align_to_reference,
+        fit_umap_streaming,
+    )
+    from projection_store import ProjectionStore
+
+    logging.basicConfig()
+    queue = JobQueue(db_path)
+    specs = load_dataset_specs()
+
+    # Only the features of the last dataset are kept in memory
+    @lru_cache(maxsize=1)
+    def load_features(dataset: str) -> np.ndarray:
+        return specs[dataset].load().features
+
+    def out_of_core_sample_size(dataset: str) -> Optional[int]:
+        # Datasets too large for memory only have UMAP projections, fitted on a sample (see
+        #   `prepare_results.save_umap_results_streaming`)
+        try:
+            return ProjectionStore(specs[dataset].results_dirpath("umap")).sample_size
+        except OSError:
+            return None
+
+    def fit(dataset: str, method: str, model) -> np.ndarray:
+        _, prepare_func, fit_func = methods[method]
+        sample_size = out_of_core_sample_size(dataset)
+        if sample_size is None:
+            return fit_func(model, prepare_func(load_features(dataset), [model]))
+        if method != "umap":
+            raise ValueError(f"Dataset {dataset} doesn't fit in memory, only its UMAP projections can be fitted")
+        spec = specs[dataset]
+        return fit_umap_streaming(model, sample_size, filepath=spec.path, label_column=spec.label_column)
+
+    def align(dataset: str, method: str, model, projection: np.ndarray) -> np.ndarray:
+        # The projections of the grid are aligned onto each other (see `prepare_results.procrustes_alignment`), so an
+        #   on-demand fit is aligned onto the nearest one, i.e. the one the dashboard shows until the fit is done
+        grid = GRIDS[method]
+        try:
+            store = ProjectionStore(specs[dataset].results_dirpath(method))
+        except OSError:
+            logger.warning(f"No projection store of {method} for {dataset}, the projection of {model} isn't aligned")
+            return projection
+        return align_to_reference(projection, store.at(grid.offset(grid.nearest(model))))
+
+    methods = {
+        "tsne": (TSNEobj, _prepare_tsne_inputs, _fit_tsne),
+        "umap": (UMAPobj, _prepare_umap_inputs, _fit_umap),
+    }
+    while True:
+        job = queue.claim()
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        key, dataset, method, params = job
+        logger.info(f"Running job {key}")
+        model_class = methods[method][0]
+        try:
+            model = model_class(**params)
+            queue.complete(key, align(dataset, method, model, fit(dataset, method, model)))
+        except Exception:
+            logger.exception(f"Job {key} failed")
+            queue.fail(key, traceback.format_exc())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the workers fitting the configs requested by the dashboard")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (default: %(default)s)")
+    parser.add_argument("--db", type=Path, default=QUEUE_DB_PATH, help="Path of the queue (default: %(default)s)")
+    args = parser.parse_args()
+
+    JobQueue(args.db).requeue_running()
+    workers = [multiprocessing.Process(target=_work, args=(args.db,)) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
@@ -0,0 +1,214 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import Flask, Response, g, request
+from os import environ, getpid
+
+# Profiling a request (see `init_metrics`) is opt-in, since a profile exposes the internals of the app
+PROFILING_ENABLED = environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_HEADER = "X-Profile"
+
+SECONDS_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+BYTES_BUCKETS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Callback being run (see `Metrics.callback`), which the stages timed by `Metrics.span` are reported under
+_CALLBACK = ContextVar("callback", default="unknown")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms, rendered in the Prometheus text format
+
+    Metrics are kept per process: with several gunicorn workers, each scrape of `/metrics` reports the worker that
+        served it (see the `pid` label of `process_info`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._buckets: Dict[str, List[float]] = {}
+        # Per set of labels: count of each bucket (plus +Inf), sum and count of the observations
+        self._histograms: Dict[str, Dict[Labels, list]] = defaultdict(dict)
+        self._computed_funcs: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._help[name] = ("counter", help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: List[float]) -> None:
+        self._help[name] = ("histogram", help_text)
+        self._buckets[name] = buckets
+
+    def computed(
+        self, name: str, help_text: str, func: Callable[[], Dict[Labels, float]], metric_type: str = "gauge"
+    ) -> None:
+        """Register a metric whose values are computed by `func` at scrape time
+
+        :return:
+        """
+        self._help[name] = (metric_type, help_text)
+        self._computed_funcs[name] = func
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        with self._lock:
+            self._counters[name][tuple(sorted(labels.items()))] += value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        buckets = self._buckets[name]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            state = self._histograms[name].setdefault(key, [[0] * (len(buckets) + 1), 0.0, 0])
+            state[0][bisect.bisect_left(buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def callback(self, name: str):
+        """Report the stages timed by `span` under the name of the callback running them, e.g. the stages of the figure
+            helpers shared by several callbacks. Also usable as a decorator of the callback.
+
+        :param name: Name of the callback
+        :return:
+        """
+        token = _CALLBACK.set(name)
+        try:
+            yield
+        finally:
+            _CALLBACK.reset(token)
+
+    @contextmanager
+    def span(self, stage: str, callback: Optional[str] = None):
+        """Time a stage of a callback into the `dashboard_stage_seconds` histogram
+
+        :param stage: Stage of the callback, e.g. "lookup", "labels", "figure_build", "style",
+            "serialization" or "query"
+        :param callback: Name of the callback, defaults to the one running (see `callback`)
+        :return:
+        """
+        callback = callback or _CALLBACK.get()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("dashboard_stage_seconds", time.perf_counter() - start, stage=stage, callback=callback)
+
+    def render(self) -> str:
+        lines = []
+        for name, (metric_type, help_text) in self._help.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            if name in self._computed_funcs:
+                for labels, value in self._computed_funcs[name]().items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            with self._lock:
+                if metric_type == "counter":
+                    for labels, value in self._counters[name].items():
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                for labels, (counts, total, count) in self._histograms[name].items():
+                    cumulative = 0
+                    for bound, bucket_count in zip([*self._buckets[name], "+Inf"], counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels((*labels, ('le', str(bound))))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.histogram(
+    "dashboard_stage_seconds",
+    "Duration of the stages of the callbacks (lookup, labels, figure_build, style, serialization, query)",
+    SECONDS_BUCKETS,
+)
+METRICS.counter("dashboard_figure_requests_total", "Figures requested by the graph callback, by method and source")
+METRICS.counter("http_requests_total", "HTTP requests, by route and status")
+METRICS.histogram("http_request_seconds", "Duration of the HTTP requests, by route", SECONDS_BUCKETS)
+METRICS.histogram("http_response_bytes", "Size of the (uncompressed) HTTP responses, by route", BYTES_BUCKETS)
+
+
+_CACHES = {}
+
+
+def register_cache(name: str, cached_func) -> None:
+    """Report the hits/misses of a `functools.lru_cache` function, e.g. the cache hit ratio of the figures
+
+    :param name: Name of the cache, used as label
+    :param cached_func: Function decorated with `lru_cache`
+    :return:
+    """
+    _CACHES[name] = cached_func
+
+
+def _cache_stats() -> Dict[Labels, float]:
+    stats = {}
+    for name, cached_func in _CACHES.items():
+        info = cached_func.cache_info()
+        stats[(("cache", name), ("result", "hit"))] = info.hits
+        stats[(("cache", name), ("result", "miss"))] = info.misses
+    return stats
+
+
+METRICS.computed(
+    "dashboard_cache_lookups_total", "Lookups of the in-process caches, by result (hit/miss)", _cache_stats, "counter"
+)
+METRICS.computed("process_info", "Process reporting the metrics", lambda: {(("pid", str(getpid())),): 1})
+
+
+def _route(rule: Optional[str]) -> str:
+    # The URL rule rather than the path, so e.g. every figure URL is counted under the same route
+    return rule or "unmatched"
+
+
+def init_metrics(server: Flask) -> None:
+    """Instrument a Flask server: request counts, durations and payload sizes, a `/metrics` endpoint in the Prometheus
+        text format and, with `PROFILING_ENABLED`, profiling of the requests sent with an `X-Profile` header
+
+    A profiled request returns the HTML report of pyinstrument instead of its response, e.g. replay a callback request
+        copied from the browser with `curl -H "X-Profile: 1" ...`.
+
+    :param server: The Flask server of the app, i.e. `app.server`
+    :return:
+    """
+    profiler_class = None
+    if PROFILING_ENABLED:
+        try:
+            from pyinstrument import Profiler as profiler_class
+        except ImportError:
+            raise ImportError("Profiling requires pyinstrument: `pip install pyinstrument`")
+
+    @server.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        if profiler_class is not None and request.headers.get(PROFILE_HEADER):
+            g.profiler = profiler_class()
+            g.profiler.start()
+
+    @server.after_request
+    def record_request(response):
+        route = _route(request.url_rule and request.url_rule.rule)
+        METRICS.inc("http_requests_total", route=route, status=str(response.status_code))
+        if "request_start" in g:
+            METRICS.observe("http_request_seconds", time.perf_counter() - g.request_start, route=route)
+        if response.content_length is not None:
+            METRICS.observe("http_response_bytes", response.content_length, route=route)
+        if "profiler" in g:
+            g.profiler.stop()
+            return Response(g.profiler.output_html(), mimetype="text/html")
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
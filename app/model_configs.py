@@ -0,0 +1,118 @@
+from typing import Dict, Iterator, List, NamedTuple, Optional, Type, Union
+
+import numpy as np
+from collections.abc import Sequence
+
+# Parameter grids of the sweeps and their model configs. This module is shared by the precompute job and the
+#   dashboard, so it must stay light: the dashboard never imports the compute path (scikit-learn, UMAP, ...).
+
+TSNE_PARAMS = {
+    "perplexity": [10, 30, 50],
+    "n_iterations": [300, 500, 1000],
+    "learning_rates": [2, 10, 50],
+}
+UMAP_PARAMS = {"n_neighbors": [2, 3, 5, 10], "min_dist": [0.1, 0.2, 0.5]}
+
+
+# Configs are immutable named tuples: compact (no per-instance __dict__), hashable and cheap to compare, so they can
+#   be used as keys of caches directly
+class TSNEobj(NamedTuple):
+    perplexity: float
+    num_iteration: int
+    learning_rate: float
+    n_components: int = 2
+
+    def get_properties_str(self):
+        return f"n_comp={self.n_components}__perp={self.perplexity}__n_iter={self.num_iteration}__learning_rate={self.learning_rate}"
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+class UMAPobj(NamedTuple):
+    n_neighbors: int
+    min_dist: float = 0.1
+    n_components: int = 2
+
+    def get_properties_str(self):
+        return f"n_comp={self.n_components}__n_neigh={self.n_neighbors}__min_dist={self.min_dist}"
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+Model = Union[TSNEobj, UMAPobj]
+
+
+class ParamGrid(Sequence):
+    """Dense N-d grid of the configs of a sweep, i.e. the cartesian product of the values of each parameter
+
+    Configs are numbered in row-major order (the last axis varies fastest), which is the order of the projections in
+        the stores written by the precompute job. The offset of a config is computed from the position of each of its
+        parameter values along its axis, so looking up a config is O(1) without building or parsing any string key.
+    """
+
+    def __init__(self, model_class: Type[Model], axes: Dict[str, List[Union[int, float]]]):
+        """
+        :param model_class: `TSNEobj` or `UMAPobj`
+        :param axes: Values of each parameter (field of `model_class`) of the grid, in the order of the axes
+        """
+        self.model_class = model_class
+        self.axes = axes
+        self.shape = tuple(len(values) for values in axes.values())
+        self._positions = [{value: i for i, value in enumerate(values)} for values in axes.values()]
+
+    def offset(self, model: Model) -> Optional[int]:
+        """Offset of a config in the grid
+
+        :return: The offset, or None if the config is off the grid
+        """
+        offset = 0
+        for field, positions, size in zip(self.axes, self._positions, self.shape):
+            position = positions.get(getattr(model, field))
+            if position is None:
+                return None
+            offset = offset * size + position
+        return offset
+
+    def __getitem__(self, offset: int) -> Model:
+        if not -len(self) <= offset < len(self):
+            raise IndexError(f"Offset {offset} is out of a grid of {len(self)} configs")
+        position = np.unravel_index(offset % len(self), self.shape)
+        return self.model_class(**{field: values[i] for (field, values), i in zip(self.axes.items(), position)})
+
+    def __len__(self) -> int:
+        return int(np.prod(self.shape))
+
+    def __iter__(self) -> Iterator[Model]:
+        return (self[offset] for offset in range(len(self)))
+
+    def __contains__(self, model) -> bool:
+        return isinstance(model, self.model_class) and self.offset(model) is not None
+
+    def nearest(self, model: Model) -> Model:
+        """The config of the grid closest to a config, parameter by parameter
+
+        :return:
+        """
+        return model._replace(
+            **{
+                field: min(values, key=lambda value: abs(value - getattr(model, field)))
+                for field, values in self.axes.items()
+            }
+        )
+
+
+TSNE_GRID = ParamGrid(
+    TSNEobj,
+    {
+        "perplexity": TSNE_PARAMS["perplexity"],
+        "num_iteration": TSNE_PARAMS["n_iterations"],
+        "learning_rate": TSNE_PARAMS["learning_rates"],
+    },
+)
+UMAP_GRID = ParamGrid(UMAPobj, {"n_neighbors": UMAP_PARAMS["n_neighbors"], "min_dist": UMAP_PARAMS["min_dist"]})
+GRIDS = {"tsne": TSNE_GRID, "umap": UMAP_GRID}
+
+TSNE_MODELS = list(TSNE_GRID)
+UMAP_MODELS = list(UMAP_GRID)
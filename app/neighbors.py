@@ -0,0 +1,133 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import logging
+import numpy as np
+import os
+import tempfile
+from projection_cache import hash_data
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Backends of the nearest neighbor search of the sweeps (see `knn_graph`)
+NEIGHBOR_BACKENDS = ["exact", "nndescent", "hnsw"]
+
+SEED = 0
+
+# Parameters of the HNSW index: number of links per node and size of the candidate lists when building the index and
+#   when querying it (as a multiple of the number of neighbors). Higher values trade speed for recall.
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_FACTOR = 2
+
+
+def _exclude_self(indices: np.ndarray, dists: np.ndarray, n_neighbors: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Drop each sample from its own neighbors
+
+    Approximate searches (and exact ones, with duplicated samples) don't always return a sample as its own first
+        neighbor, so the sample is looked for in the whole row rather than assumed to be the first column.
+
+    :return: The indices and distances of the `n_neighbors` nearest neighbors of each sample, excluding itself
+    """
+    is_self = indices == np.arange(len(indices))[:, None]
+    # Stable sort, so the other neighbors keep their order
+    order = np.argsort(is_self, axis=1, kind="stable")[:, :n_neighbors]
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(dists, order, axis=1)
+
+
+def _exact_knn(data: np.ndarray, n_neighbors: int) -> Tuple[np.ndarray, np.ndarray]:
+    from sklearn.neighbors import NearestNeighbors
+
+    dists, indices = NearestNeighbors(n_neighbors=n_neighbors).fit(data).kneighbors(data)
+    return indices, dists
+
+
+def _nndescent_knn(data: np.ndarray, n_neighbors: int) -> Tuple[np.ndarray, np.ndarray]:
+    from pynndescent import NNDescent
+
+    return NNDescent(data, n_neighbors=n_neighbors, random_state=SEED).neighbor_graph
+
+
+def _hnsw_index(data: np.ndarray, index_dir: Optional[Path]):
+    """Build the HNSW index of the data, or load it from `index_dir` if it was built before (e.g. by the sweep of the
+        other method, or by a previous run)
+
+    :return:
+    """
+    try:
+        import hnswlib
+    except ImportError:
+        raise ImportError("The hnsw neighbor backend requires hnswlib: `pip install hnswlib`")
+
+    index = hnswlib.Index(space="l2", dim=data.shape[1])
+    filepath = None
+    if index_dir is not None:
+        filepath = Path(index_dir).joinpath(f"hnsw_{hash_data(data)}_M={HNSW_M}_ef={HNSW_EF_CONSTRUCTION}.bin")
+        if filepath.exists():
+            logger.info(f"Loading the HNSW index from {filepath}")
+            index.load_index(str(filepath), max_elements=len(data))
+            return index
+
+    logger.info(f"Building the HNSW index of {len(data)} samples")
+    index.init_index(max_elements=len(data), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, random_seed=SEED)
+    index.add_items(data, np.arange(len(data)))
+    if filepath is not None:
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name, so a crash never leaves a truncated index behind
+        fd, tmp_filepath = tempfile.mkstemp(dir=filepath.parent, suffix=".tmp")
+        os.close(fd)
+        index.save_index(tmp_filepath)
+        os.replace(tmp_filepath, filepath)
+    return index
+
+
+def _hnsw_knn(data: np.ndarray, n_neighbors: int, index_dir: Optional[Path]) -> Tuple[np.ndarray, np.ndarray]:
+    index = _hnsw_index(data, index_dir)
+    index.set_ef(max(HNSW_EF_FACTOR * n_neighbors, HNSW_EF_CONSTRUCTION))
+    indices, squared_dists = index.knn_query(data, k=n_neighbors)
+    return indices.astype(np.int64), np.sqrt(squared_dists)
+
+
+def knn_graph(
+    data,
+    n_neighbors: int,
+    backend: str = "exact",
+    index_dir: Optional[Path] = None,
+    include_self: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute the (euclidean) k-nearest neighbor graph of the data
+
+    - "exact": exact search with scikit-learn. Its cost grows quickly with the number of samples and of features.
+    - "nndescent": approximate search with NN-descent (pynndescent, a dependency of UMAP).
+    - "hnsw": approximate search with an HNSW index (hnswlib). The index doesn't depend on the number of neighbors, so
+        it's persisted in `index_dir` and reused by every later search on the same data.
+    `python benchmark.py neighbors` reports the recall and the speed of each backend.
+
+    :param data: Input data (features)
+    :param n_neighbors: Number of neighbors of each sample
+    :param backend: One of `NEIGHBOR_BACKENDS`
+    :param index_dir: Directory of the persisted indexes (only used by "hnsw")
+    :param include_self: Whether each sample is its own first neighbor (as expected by UMAP), or is left out (as
+        expected by t-SNE)
+    :return: The indices and the distances of the neighbors of each sample, sorted by distance
+    """
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    n_neighbors = min(n_neighbors, len(data) - 1 + include_self)
+    logger.info(f"Computing the kNN graph for n_neighbors={n_neighbors} with the {backend} backend")
+    # One more neighbor, since each sample is (usually) found as its own nearest neighbor
+    n_query = min(n_neighbors + 1, len(data))
+    if backend == "exact":
+        indices, dists = _exact_knn(data, n_query)
+    elif backend == "nndescent":
+        indices, dists = _nndescent_knn(data, n_query)
+    elif backend == "hnsw":
+        indices, dists = _hnsw_knn(data, n_query, index_dir)
+    else:
+        raise ValueError(f"Unknown neighbor backend {backend}, expected one of {NEIGHBOR_BACKENDS}")
+
+    if not include_self:
+        return _exclude_self(indices, dists, n_neighbors)
+    indices, dists = _exclude_self(indices, dists, n_neighbors - 1)
+    self_indices = np.arange(len(data))[:, None]
+    return np.hstack([self_indices, indices]), np.hstack([np.zeros_like(dists[:, :1]), dists])
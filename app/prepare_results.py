@@ -1,136 +1,610 @@
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+import argparse
 import logging
-import pickle
-import plotly.express as px
-from dataclasses import dataclass
-from dataclasses_json import dataclass_json
-from itertools import product
-from sklearn.manifold import TSNE
+import multiprocessing
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataset_registry import REGISTRY_PATH, DatasetSpec, load_dataset_specs
+from datasets import (
+    CHUNK_SIZE,
+    DATASET_PATH,
+    LABEL_COLUMN,
+    LABELS_PATH,
+    iter_feature_chunks,
+    sample_features,
+)
+from functools import partial
+from model_configs import (
+    TSNE_MODELS,
+    UMAP_MODELS,
+    TSNEobj,
+    UMAPobj,
+)
+from neighbors import NEIGHBOR_BACKENDS, knn_graph
+from numba import set_num_threads
+from openTSNE import TSNEEmbedding
+from openTSNE.affinity import PerplexityBasedNN
+from openTSNE.initialization import random as random_initialization
+from openTSNE.nearest_neighbors import PrecomputedNeighbors
+from projection_cache import ProjectionCache, hash_data
+from projection_store import INDEX_FILENAME, ProjectionStoreWriter, write_projection_store
+from quality_metrics import compute_quality_metrics
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+from threadpoolctl import threadpool_limits
 from umap import UMAP
+from umap.umap_ import nearest_neighbors
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-TSNE_PARAMS = {
-    "perplexity": [10, 30, 50],
-    "n_iterations": [300, 500, 1000],
-    "learning_rates": [2, 10, 50],
-}
-UMAP_PARAMS = {"n_neighbors": [2, 3, 5, 10], "min_dist": [0.1, 0.2, 0.5]}
-
 DATA_DIR = Path(".")
-TSNE_RESULTS_FILEPATH = DATA_DIR.joinpath("tsne_projection_results.pkl")
-UMAP_RESULTS_FILEPATH = DATA_DIR.joinpath("umap_projection_results.pkl")
+CACHE_DIR = DATA_DIR.joinpath(".projection_cache")
+# Persisted nearest neighbor indexes (see `neighbors.knn_graph`), within the cache directory
+NEIGHBORS_CACHE_DIRNAME = "neighbors"
 
 SEED = 0
 
 
-@dataclass_json
-@dataclass
-class TSNEobj:
-    perplexity: float
-    num_iteration: int
-    learning_rate: float
-    n_components: int = 2
+# Number of rows used to estimate the alignment of the projections of a sweep
+_ALIGNMENT_SAMPLE_SIZE = 10_000
+_ALIGNMENT_ITER = 3
+
+# Below this number of samples, UMAP computes exact nearest neighbors instead of using NN-descent
+_UMAP_SMALL_DATA_SIZE = 4096
 
-    def get_properties_str(self):
-        return f"n_comp={self.n_components}__perp={self.perplexity}__n_iter={self.num_iteration}__learning_rate={self.learning_rate}"
 
+def _umap_graph_size(data, models: List[UMAPobj]) -> int:
+    return max(model.n_neighbors for model in models)
 
-@dataclass_json
-@dataclass
-class UMAPobj:
-    n_neighbors: int
-    min_dist: float = 0.1
-    n_components: int = 2
 
-    def get_properties_str(self):
-        return f"n_comp={self.n_components}__n_neigh={self.n_neighbors}__min_dist={self.min_dist}"
+def _prepare_umap_inputs(
+    data, models: List[UMAPobj], neighbors: str = "auto", index_dir: Optional[Path] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compute the kNN graph shared by all the UMAP models of a sweep
+
+    The graph is computed once for the largest `n_neighbors` of the sweep. Since neighbors are sorted by distance, the
+        graph of a smaller `n_neighbors` is a prefix of it, and models differing only by `min_dist` share the same one.
+
+    :param data: Input data (features) to be projected
+    :param models: UMAP models of the sweep
+    :param neighbors: Backend of the nearest neighbor search (see `neighbors.knn_graph`). "auto" uses an exact search
+        for small datasets and UMAP's own NN-descent otherwise.
+    :param index_dir: Directory of the persisted nearest neighbor indexes
+    :return: The data, the kNN indices and the kNN distances
+    """
+    data = np.asarray(data, dtype=np.float32)
+    n_neighbors = _umap_graph_size(data, models)
+    logger.info(f"Computing the UMAP kNN graph for n_neighbors={n_neighbors}")
+    if neighbors != "auto":
+        knn_indices, knn_dists = knn_graph(data, n_neighbors, neighbors, index_dir, include_self=True)
+    elif data.shape[0] < _UMAP_SMALL_DATA_SIZE:
+        knn_dists, knn_indices = NearestNeighbors(n_neighbors=n_neighbors).fit(data).kneighbors(data)
+    else:
+        knn_indices, knn_dists, _ = nearest_neighbors(
+            data,
+            n_neighbors,
+            metric="euclidean",
+            metric_kwds={},
+            angular=False,
+            random_state=check_random_state(SEED),
+        )
+    return data, knn_indices, knn_dists.astype(np.float32)
 
 
-tsne_model_params = list(
-    product(
-        TSNE_PARAMS["perplexity"],
-        TSNE_PARAMS["n_iterations"],
-        TSNE_PARAMS["learning_rates"],
+def _fit_umap(model: UMAPobj, inputs: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+    logger.info(f"Working on UMAP model: {model}")
+    data, knn_indices, knn_dists = inputs
+    umap = UMAP(
+        n_components=model.n_components,
+        n_neighbors=model.n_neighbors,
+        min_dist=model.min_dist,
+        random_state=SEED,
+        precomputed_knn=(
+            np.ascontiguousarray(knn_indices[:, : model.n_neighbors]),
+            np.ascontiguousarray(knn_dists[:, : model.n_neighbors]),
+        ),
     )
-)
-TSNE_MODELS = [
-    TSNEobj(perplexity=perp, num_iteration=n_iter, learning_rate=eta)
-    for perp, n_iter, eta in tsne_model_params
-]
-
-umap_model_params = list(product(UMAP_PARAMS["n_neighbors"], UMAP_PARAMS["min_dist"]))
-UMAP_MODELS = [
-    UMAPobj(n_neighbors=n_neigh, min_dist=dist) for n_neigh, dist in umap_model_params
-]
-
-
-def convert_param_str_to_dict(s: str) -> Dict[str, float]:
-    """Convert parameters string to a dictionary
-    Example:
-        s = 'n_comp=2__perp=30.0__n_iter=100__learning_rate=200.0'
-
-        Step 1: Split parameters by "__"
-            >> ['n_comp=2', 'perp=30.0', 'n_iter=100', 'learning_rate=200.0']
-        Step 2: Split by "="
-            >> [ ['n_comp', '2'], ['perp', '30.0'], ['n_iter', '100'], ['learning_rate', '200.0'] ]
-        Step 3: Convert to dictionary
-            >> {'n_comp': 2.0, 'perp': 30.0, 'n_iter': 100.0, 'learning_rate': 200.0}
-    :param s:
+    return umap.fit_transform(data)
+
+
+def _tsne_graph_size(data, models: List[TSNEobj]) -> int:
+    return min(len(data) - 1, int(3 * max(model.perplexity for model in models)))
+
+
+def _prepare_tsne_inputs(
+    data, models: List[TSNEobj], neighbors: str = "auto", index_dir: Optional[Path] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute the kNN graph shared by all the t-SNE models of a sweep
+
+    Barnes-Hut t-SNE only needs the `3 * perplexity` nearest neighbors of each sample, so the graph is computed once
+        for the largest perplexity of the sweep, and the graph of every other perplexity is a prefix of it.
+
+    :param data: Input data (features) to be projected
+    :param models: t-SNE models of the sweep
+    :param neighbors: Backend of the nearest neighbor search (see `neighbors.knn_graph`). "auto" is an exact search.
+    :param index_dir: Directory of the persisted nearest neighbor indexes
+    :return: The kNN indices and the kNN distances (excluding each sample itself)
+    """
+    data = np.asarray(data, dtype=np.float32)
+    n_neighbors = _tsne_graph_size(data, models)
+    logger.info(f"Computing the t-SNE kNN graph for n_neighbors={n_neighbors}")
+    if neighbors != "auto":
+        return knn_graph(data, n_neighbors, neighbors, index_dir)
+    knn_dists, knn_indices = NearestNeighbors(n_neighbors=n_neighbors).fit(data).kneighbors()
+    return knn_indices, knn_dists
+
+
+# Same optimization schedule as scikit-learn's TSNE: early exaggeration of 12 with a momentum of 0.5 for the first
+#   250 iterations, then no exaggeration with a momentum of 0.8
+_TSNE_EXAGGERATION_ITER = 250
+_TSNE_EARLY_EXAGGERATION = 12
+
+
+def _tsne_chain_key(model: TSNEobj) -> Tuple[float, float, int]:
+    return model.perplexity, model.learning_rate, model.n_components
+
+
+def _fit_tsne_chain(models: List[TSNEobj], inputs: Tuple[np.ndarray, np.ndarray]) -> List[np.ndarray]:
+    """Fit t-SNE models differing only by their number of iterations with a single optimization
+
+    The embedding is optimized up to the largest number of iterations, and a snapshot is taken whenever it reaches
+        the number of iterations of one of the models, e.g. [300, 500, 1000] costs 1000 iterations instead of 1800.
+
+    :param models: t-SNE models sharing the same `_tsne_chain_key`
+    :param inputs: kNN indices and distances computed by `_prepare_tsne_inputs`
+    :return: The projection of each model, in the order of `models`
+    """
+    knn_indices, knn_dists = inputs
+    perplexity, learning_rate, n_components = _tsne_chain_key(models[0])
+    logger.info(f"Working on t-SNE models: {models}")
+    n_neighbors = min(len(knn_indices) - 1, int(3 * perplexity))
+    affinities = PerplexityBasedNN(
+        perplexity=perplexity,
+        knn_index=PrecomputedNeighbors(
+            np.ascontiguousarray(knn_indices[:, :n_neighbors]), np.ascontiguousarray(knn_dists[:, :n_neighbors])
+        ),
+    )
+    init = random_initialization(len(knn_indices), n_components, random_state=SEED)
+    # The gradient of scikit-learn's TSNE is 4 times larger than the one of openTSNE, hence the scaled learning rate
+    optim_params = dict(learning_rate=4 * learning_rate, max_grad_norm=None)
+    embedding = TSNEEmbedding(init, affinities, random_state=SEED).optimize(
+        n_iter=_TSNE_EXAGGERATION_ITER, exaggeration=_TSNE_EARLY_EXAGGERATION, momentum=0.5, **optim_params
+    )
+
+    n_iter, projections = _TSNE_EXAGGERATION_ITER, {}
+    for num_iteration in sorted({model.num_iteration for model in models}):
+        if num_iteration > n_iter:
+            embedding = embedding.optimize(n_iter=num_iteration - n_iter, momentum=0.8, **optim_params)
+            n_iter = num_iteration
+        projections[num_iteration] = np.array(embedding)
+    return [projections[model.num_iteration] for model in models]
+
+
+def _fit_tsne(model: TSNEobj, inputs: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    return _fit_tsne_chain([model], inputs)[0]
+
+
+# Inputs shared by all the fits of a sweep. They are set once per worker process by `_init_worker` rather than being
+#   pickled along with every single task.
+_WORKER_INPUTS = None
+
+
+def _init_worker(inputs, n_threads: int) -> None:
+    """Initializer of the sweep worker processes
+
+    Each worker caps its BLAS/OpenMP (threadpoolctl) and numba thread pools to `n_threads`, so that `n_jobs`
+    concurrent fits don't oversubscribe the cores of the machine.
+
+    :param inputs: Inputs of the sweep shared by all the fits
+    :param n_threads: Maximum number of threads used by a single worker
     :return:
     """
-    s_ = s.split("__")
-    s_ = [s.split("=") for s in s_]
-    return {s[0]: float(s[1]) for s in s_}
-
-
-def save_umap_results(data, out_filepath: Path):
-    results = {}
-    for model in UMAP_MODELS:
-        logger.info(f"Working on UMAP model: {model}")
-        umap = UMAP(
-            n_components=model.n_components,
-            n_neighbors=model.n_neighbors,
-            min_dist=model.min_dist,
-            random_state=SEED,
-        )
-        projections = umap.fit_transform(data)
-        results[model.get_properties_str()] = {
-            "proj": projections,
-            "model": model.to_dict(),
-        }
-    with open(out_filepath, "wb") as f:
-        pickle.dump(results, f)
-
-
-def save_tsne_results(data, out_filepath: Path):
-    results = {}
-    for model in TSNE_MODELS:
-        logger.info(f"Working on t-SNE model: {model}")
-        tsne = TSNE(
-            n_components=model.n_components,
-            perplexity=model.perplexity,
-            learning_rate=model.learning_rate,
-            n_iter=model.num_iteration,
-            init="random",
-            random_state=SEED,
-        )
-        projections = tsne.fit_transform(data)
-        results[model.get_properties_str()] = {
-            "proj": projections,
-            "model": model.to_dict(),
-        }
-    with open(out_filepath, "wb") as f:
-        pickle.dump(results, f)
+    global _WORKER_INPUTS
+    _WORKER_INPUTS = inputs
+    threadpool_limits(limits=n_threads)
+    set_num_threads(n_threads)
+
+
+def _fit_task(fit_func: Callable, models: List[Union[TSNEobj, UMAPobj]], inputs, chained: bool) -> List[np.ndarray]:
+    return fit_func(models, inputs) if chained else [fit_func(models[0], inputs)]
+
+
+def _fit_in_worker(fit_func: Callable, models: List[Union[TSNEobj, UMAPobj]], chained: bool) -> List[np.ndarray]:
+    return _fit_task(fit_func, models, _WORKER_INPUTS, chained)
+
+
+def run_sweep(
+    fit_func: Callable,
+    models: List[Union[TSNEobj, UMAPobj]],
+    data,
+    prepare_func: Optional[Callable] = None,
+    n_jobs: int = 1,
+    threads_per_job: Optional[int] = None,
+    cache: Optional[ProjectionCache] = None,
+    chain_key: Optional[Callable] = None,
+) -> Dict[str, dict]:
+    """Fit every model of a parameter sweep and collect the projections
+
+    With `n_jobs > 1`, the fits are spread across a pool of worker processes. Since every fit is seeded with `SEED`
+        and the results are collected in the order of `models` (not in order of completion), the returned dictionary
+        is identical to the one of the serial path.
+    With a `cache`, the models whose projection is already on disk are not refitted, and every new projection is
+        persisted as soon as its fit finishes.
+
+    :param fit_func: Function fitting a single model, i.e. `_fit_tsne` or `_fit_umap`, or a chain of models (see
+        `chain_key`), i.e. `_fit_tsne_chain`
+    :param models: List of model configurations, i.e. `TSNE_MODELS` or `UMAP_MODELS`
+    :param data: Input data (features) to be projected
+    :param prepare_func: Optional function computing, once for all the models of the sweep, the inputs shared by their
+        fits (e.g. a kNN graph) from the data, i.e. `_prepare_tsne_inputs` or `_prepare_umap_inputs`. It's only called
+        if some models are left to fit.
+    :param n_jobs: Number of worker processes. -1 means using all the available cores.
+    :param threads_per_job: Maximum number of threads per worker. Defaults to splitting the cores evenly among workers.
+    :param cache: Optional per-config cache of the projections
+    :param chain_key: Optional function of a model. Models with the same key (e.g. t-SNE models differing only by
+        their number of iterations) are fitted together by a single `fit_func(models, inputs)` call returning the
+        projection of each of them.
+    :return: A dictionary of results keyed by the properties string of each model
+    """
+    projections = {}
+    if cache is not None:
+        for i, model in enumerate(models):
+            if model in cache:
+                projections[i] = cache.load(model)
+        logger.info(f"{len(projections)} out of {len(models)} projections loaded from {cache.directory}")
+    todo = [i for i in range(len(models)) if i not in projections]
+    chains = {}
+    for i in todo:
+        chains.setdefault(i if chain_key is None else chain_key(models[i]), []).append(i)
+    tasks = list(chains.values())
+
+    def _collect(task: List[int], projs: List[np.ndarray]) -> None:
+        for i, proj in zip(task, projs):
+            projections[i] = proj
+            if cache is not None:
+                cache.save(models[i], proj)
+
+    inputs = data
+    if todo and prepare_func is not None:
+        # Sized for all the models rather than only the ones left to fit: an approximate kNN graph of k neighbors isn't
+        #   a prefix of the one of a larger k, so the fits must not depend on which projections were cached
+        inputs = prepare_func(data, models)
+
+    n_cpus = os.cpu_count() or 1
+    if n_jobs == -1:
+        n_jobs = n_cpus
+    n_jobs = max(1, min(n_jobs, len(tasks)))
+
+    chained = chain_key is not None
+    if n_jobs == 1:
+        for task in tasks:
+            _collect(task, _fit_task(fit_func, [models[i] for i in task], inputs, chained))
+    else:
+        if threads_per_job is None:
+            threads_per_job = max(1, n_cpus // n_jobs)
+        # Workers are spawned rather than forked: forking a process that already started OpenMP/numba thread pools
+        #   can deadlock the children.
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(inputs, threads_per_job),
+        ) as executor:
+            futures = {
+                executor.submit(_fit_in_worker, fit_func, [models[i] for i in task], chained): task for task in tasks
+            }
+            for future in as_completed(futures):
+                _collect(futures[future], future.result())
+
+    return {
+        model.get_properties_str(): {"proj": projections[i], "model": model.to_dict()}
+        for i, model in enumerate(models)
+    }
+
+
+def procrustes_alignment(projections: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Align the projections of a sweep onto each other (generalized Procrustes analysis)
+
+    Every projection is centered and rotated (or mirrored) onto the mean shape of the sweep, so that moving from a
+        config to the next one (e.g. in the animated sweep of the dashboard) doesn't spin or flip the plot. Distances
+        are preserved, hence the shape and the quality metrics of the projections as well.
+    The rotations of all the projections are computed at once with a batched SVD, on a sample of the rows.
+
+    :param projections: Projections of the configs of a sweep (or of a sample of their rows)
+    :return: The center (n_configs, n_components) and the rotation (n_configs, n_components, n_components) of each
+        projection, to be applied as `(projection - center) @ rotation`
+    """
+    centers = np.stack([np.asarray(projection, dtype=np.float64).mean(axis=0) for projection in projections])
+    n_rows = len(projections[0])
+    rows = np.arange(n_rows)
+    if n_rows > _ALIGNMENT_SAMPLE_SIZE:
+        rows = np.sort(np.random.default_rng(SEED).choice(n_rows, _ALIGNMENT_SAMPLE_SIZE, replace=False))
+    shapes = np.stack([np.asarray(projection, dtype=np.float64)[rows] for projection in projections])
+    shapes -= centers[:, None]
+    # Scaled to unit norm, so that the mean shape isn't dominated by the projections of larger scale
+    shapes /= np.linalg.norm(shapes, axis=(1, 2), keepdims=True)
+    reference = shapes[0]
+    for _ in range(_ALIGNMENT_ITER):
+        u, _, vt = np.linalg.svd(np.swapaxes(shapes, 1, 2) @ reference)
+        rotations = u @ vt
+        reference = (shapes @ rotations).mean(axis=0)
+    return centers, rotations
+
+
+def align_to_reference(projection: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Align a projection onto a reference one (see `procrustes_alignment`), e.g. a config fitted on demand onto the
+        stored projection of the nearest config of its sweep, so switching between them doesn't spin or flip the plot
+
+    :param projection: Projection to align
+    :param reference: Projection of the same rows, in the frame to align onto
+    :return: The aligned projection
+    """
+    centers, rotations = procrustes_alignment([reference, projection])
+    # Rotated onto the mean shape of both, then back into the frame of the reference
+    return ((projection - centers[1]) @ rotations[1] @ rotations[0].T + centers[0]).astype(np.float32)
+
+
+def align_results(results: Dict[str, dict]) -> Dict[str, dict]:
+    """Align the projections of a sweep (see `procrustes_alignment`) before they're written to their store
+
+    :param results: Results of a sweep, as returned by `run_sweep`
+    :return: The results, with the aligned projections
+    """
+    centers, rotations = procrustes_alignment([result["proj"] for result in results.values()])
+    for result, center, rotation in zip(results.values(), centers, rotations):
+        result["proj"] = ((result["proj"] - center) @ rotation).astype(np.float32)
+    return results
+
+
+def add_quality_metrics(results: Dict[str, dict], data, labels=None) -> Dict[str, dict]:
+    """Score the projections of a sweep (see `quality_metrics.compute_quality_metrics`), all at once
+
+    :param results: Results of a sweep, as returned by `run_sweep`
+    :param data: Input data (features) of the projections
+    :param labels: Label of each sample, for the silhouette
+    :return: The results, with the "metrics" of each config
+    """
+    metrics = compute_quality_metrics(data, [result["proj"] for result in results.values()], labels, seed=SEED)
+    for result, config_metrics in zip(results.values(), metrics):
+        result["metrics"] = config_metrics
+    return results
+
+
+def _sweep_cache_and_index_dir(
+    cache_dir: Optional[Path], method: str, data, neighbors: str, graph_size: int
+) -> Tuple[Optional[ProjectionCache], Optional[Path]]:
+    """Cache of the projections of a sweep and directory of its persisted nearest neighbor indexes
+
+    The projections depend on the kNN graph they were fitted on: each backend other than "auto" has its own cache, and
+        so does each size of the graph, since an approximate graph of k neighbors isn't a prefix of the one of a larger
+        k (e.g. growing the `n_neighbors` axis of the grid refits every config).
+
+    :param graph_size: Number of neighbors of the kNN graph shared by the fits of the sweep
+    :return:
+    """
+    if cache_dir is None:
+        return None, None
+    if neighbors != "auto":
+        method = f"{method}-{neighbors}"
+    cache = ProjectionCache(cache_dir, method, f"{hash_data(data)}__knn={graph_size}")
+    return cache, Path(cache_dir).joinpath(NEIGHBORS_CACHE_DIRNAME)
+
+
+def save_umap_results(
+    data,
+    out_dirpath: Path,
+    n_jobs: int = 1,
+    cache_dir: Optional[Path] = CACHE_DIR,
+    labels=None,
+    neighbors: str = "auto",
+):
+    graph_size = _umap_graph_size(data, UMAP_MODELS)
+    cache, index_dir = _sweep_cache_and_index_dir(cache_dir, "umap", data, neighbors, graph_size)
+    prepare_func = partial(_prepare_umap_inputs, neighbors=neighbors, index_dir=index_dir)
+    results = run_sweep(_fit_umap, UMAP_MODELS, data, prepare_func, n_jobs=n_jobs, cache=cache)
+    results = add_quality_metrics(align_results(results), data, labels)
+    write_projection_store(results, out_dirpath)
+
+
+def _fit_umap_on_sample(model: UMAPobj, sample: np.ndarray) -> UMAP:
+    logger.info(f"Working on UMAP model: {model}")
+    return UMAP(
+        n_components=model.n_components,
+        n_neighbors=model.n_neighbors,
+        min_dist=model.min_dist,
+        random_state=SEED,
+    ).fit(sample)
+
+
+def fit_umap_streaming(
+    model: UMAPobj, sample_size: int, chunk_size: int = CHUNK_SIZE, **dataset_kwargs
+) -> np.ndarray:
+    """Out-of-core fit of a single UMAP model, e.g. an on-demand fit of the job queue for a dataset precomputed by
+        `save_umap_results_streaming`
+
+    The model is fitted on the same sample as the models of the store (same size and seed), and the whole dataset is
+        projected chunk by chunk. Only the projection itself is held in memory, not the features.
+
+    :param model: UMAP model
+    :param sample_size: Number of samples used to fit the model
+    :param chunk_size: Number of rows transformed at once
+    :param dataset_kwargs: Keyword arguments of `datasets.iter_feature_chunks` selecting the dataset
+    :return: The projection of the dataset
+    """
+    sample, n_rows = sample_features(sample_size, SEED, chunk_size=chunk_size, **dataset_kwargs)
+    logger.info(f"Fitting the UMAP model on {len(sample)} out of {n_rows} samples")
+    umap = _fit_umap_on_sample(model, sample)
+    del sample
+    projection = np.empty((n_rows, model.n_components), dtype=np.float32)
+    start = 0
+    for chunk in iter_feature_chunks(chunk_size=chunk_size, **dataset_kwargs):
+        projection[start : start + len(chunk)] = umap.transform(chunk)
+        start += len(chunk)
+    return projection
+
+
+def save_umap_results_streaming(
+    out_dirpath: Path, sample_size: int, chunk_size: int = CHUNK_SIZE, **dataset_kwargs
+) -> None:
+    """Out-of-core variant of `save_umap_results` for datasets that don't fit in memory
+
+    Every UMAP model is fitted on a uniform random sample of the dataset. The whole dataset is then streamed chunk by
+        chunk through `transform`, and the projected chunks are written straight into the store. Peak memory is
+        bounded by the sample and chunk sizes rather than by the size of the dataset.
+    The quality metrics and the alignment of the projections are computed on the embedding of the sample (without the
+        silhouette, since the labels aren't streamed).
+
+    :param out_dirpath: Directory of the projection store
+    :param sample_size: Number of samples used to fit the models
+    :param chunk_size: Number of rows transformed at once
+    :param dataset_kwargs: Keyword arguments of `datasets.iter_feature_chunks` selecting the dataset
+    :return:
+    """
+    sample, n_rows = sample_features(sample_size, SEED, chunk_size=chunk_size, **dataset_kwargs)
+    logger.info(f"Fitting the UMAP models on {len(sample)} out of {n_rows} samples")
+    umaps = {model.get_properties_str(): _fit_umap_on_sample(model, sample) for model in UMAP_MODELS}
+    embeddings = [umap.embedding_ for umap in umaps.values()]
+    metrics = dict(zip(umaps, compute_quality_metrics(sample, embeddings, seed=SEED)))
+    alignments = dict(zip(umaps, zip(*procrustes_alignment(embeddings))))
+    del sample
+
+    models = {model.get_properties_str(): model.to_dict() for model in UMAP_MODELS}
+    n_components = UMAP_MODELS[0].n_components
+    with ProjectionStoreWriter(out_dirpath, models, n_rows, n_components, metrics, sample_size) as writer:
+        start = 0
+        for chunk in iter_feature_chunks(chunk_size=chunk_size, **dataset_kwargs):
+            for key, umap in umaps.items():
+                center, rotation = alignments[key]
+                writer.write(key, (umap.transform(chunk) - center) @ rotation, start)
+            start += len(chunk)
+            logger.info(f"Projected {start} out of {n_rows} samples")
+
+
+def save_tsne_results(
+    data,
+    out_dirpath: Path,
+    n_jobs: int = 1,
+    cache_dir: Optional[Path] = CACHE_DIR,
+    labels=None,
+    neighbors: str = "auto",
+):
+    # Projections cached by the former scikit-learn implementation are not reused
+    graph_size = _tsne_graph_size(data, TSNE_MODELS)
+    cache, index_dir = _sweep_cache_and_index_dir(cache_dir, "opentsne", data, neighbors, graph_size)
+    results = run_sweep(
+        _fit_tsne_chain,
+        TSNE_MODELS,
+        data,
+        partial(_prepare_tsne_inputs, neighbors=neighbors, index_dir=index_dir),
+        n_jobs=n_jobs,
+        cache=cache,
+        chain_key=_tsne_chain_key,
+    )
+    results = add_quality_metrics(align_results(results), data, labels)
+    write_projection_store(results, out_dirpath)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the t-SNE and UMAP projections of the dashboard")
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to fit the models of a sweep (-1 to use all the cores)",
+    )
+    parser.add_argument(
+        "--name",
+        help=f"Name of a dataset of the registry ({REGISTRY_PATH}), whose path, labels and results directory are read "
+        "from the registry instead of the options below",
+    )
+    parser.add_argument(
+        "--dataset",
+        default=DATASET_PATH,
+        help="Path of the dataset (CSV, Parquet, .npy or .npz). Defaults to $DATASET_PATH, or the Iris data.",
+    )
+    parser.add_argument(
+        "--label-column",
+        default=LABEL_COLUMN,
+        help="Column of the labels in a CSV/Parquet dataset (default: $DATASET_LABEL_COLUMN or %(default)s)",
+    )
+    parser.add_argument(
+        "--labels",
+        default=LABELS_PATH,
+        help="Path of the labels (.npy) of a .npy dataset. Defaults to $DATASET_LABELS_PATH.",
+    )
+    parser.add_argument(
+        "--results-dir",
+        default=str(DATA_DIR),
+        help="Directory of the projection stores (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sample-size",
+        type=int,
+        help="Out-of-core mode for datasets larger than memory: fit UMAP on a random sample of this size and project "
+        "the rest in streamed chunks. t-SNE can't project new data, so it's skipped in this mode.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="Number of rows read and projected at once in the out-of-core mode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--neighbors",
+        choices=["auto"] + NEIGHBOR_BACKENDS,
+        default="auto",
+        help="Nearest neighbor search of the sweeps: exact, NN-descent, or an HNSW index persisted in the cache "
+        "(requires hnswlib). See `python benchmark.py neighbors` for their recall and speed. "
+        "Default: %(default)s, i.e. exact for t-SNE and for small datasets, NN-descent for UMAP on larger ones.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Refit every model instead of reusing the projections cached in {CACHE_DIR}",
+    )
+    args = parser.parse_args()
+    cache_dir = None if args.no_cache else CACHE_DIR
+    logging.basicConfig()
 
-    df = px.data.iris()
-    features = df[["sepal_length", "sepal_width", "petal_length", "petal_width"]]
+    if args.name is None:
+        spec = DatasetSpec(args.dataset, args.label_column, args.labels, args.results_dir)
+    else:
+        spec = load_dataset_specs()[args.name]
 
-    save_tsne_results(features, TSNE_RESULTS_FILEPATH)
-    save_umap_results(features, UMAP_RESULTS_FILEPATH)
+    if args.sample_size is None:
+        dataset = spec.load()
+        save_tsne_results(
+            dataset.features,
+            spec.results_dirpath("tsne"),
+            n_jobs=args.n_jobs,
+            cache_dir=cache_dir,
+            labels=dataset.labels,
+            neighbors=args.neighbors,
+        )
+        save_umap_results(
+            dataset.features,
+            spec.results_dirpath("umap"),
+            n_jobs=args.n_jobs,
+            cache_dir=cache_dir,
+            labels=dataset.labels,
+            neighbors=args.neighbors,
+        )
+    else:
+        logger.warning("Out-of-core mode: only the UMAP projections are computed")
+        save_umap_results_streaming(
+            spec.results_dirpath("umap"),
+            args.sample_size,
+            args.chunk_size,
+            filepath=spec.path,
+            label_column=spec.label_column,
+        )
+        # The t-SNE projections of a previous (in-memory) run don't match the new data: the app serves the dataset
+        #   UMAP-only instead of pairing them with the new labels
+        stale_index = spec.results_dirpath("tsne").joinpath(INDEX_FILENAME)
+        if stale_index.exists():
+            logger.warning(f"Removing the stale t-SNE projections of {spec.results_dirpath('tsne')}")
+            stale_index.unlink()
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import hashlib
+import numpy as np
+import os
+import tempfile
+
+
+def hash_data(data) -> str:
+    """Compute a short fingerprint of the input data of a sweep
+
+    The dtype and shape are part of the hash, so the same bytes with a different layout don't collide.
+
+    :param data: Array-like input data (numpy array or pandas DataFrame)
+    :return: A hexadecimal digest of the data
+    """
+    arr = np.ascontiguousarray(np.asarray(data))
+    digest = hashlib.sha256()
+    digest.update(f"{arr.dtype.str}{arr.shape}".encode())
+    digest.update(memoryview(arr).cast("B"))
+    return digest.hexdigest()[:16]
+
+
+class ProjectionCache:
+    """On-disk cache holding the projection of every single model config of a sweep
+
+    Each projection is saved in its own `.npy` file, named after `get_properties_str()` of the model, in a directory
+        specific to the projection method and the hash of the input data. A projection is persisted as soon as its fit
+        finishes, so an interrupted sweep can be resumed and growing a parameter grid only fits the new configs (unless
+        it grows the kNN graph the fits are built on, see `prepare_results._sweep_cache_and_index_dir`).
+    """
+
+    def __init__(self, cache_dir: Path, method: str, data_hash: str):
+        self.directory = Path(cache_dir).joinpath(method, data_hash)
+
+    def _filepath(self, model) -> Path:
+        return self.directory.joinpath(f"{model.get_properties_str()}.npy")
+
+    def __contains__(self, model) -> bool:
+        return self._filepath(model).exists()
+
+    def load(self, model) -> np.ndarray:
+        return np.load(self._filepath(model), allow_pickle=False)
+
+    def save(self, model, projection: np.ndarray) -> None:
+        """Atomically persist the projection of a model, so a crash never leaves a truncated entry behind
+
+        :param model: A `TSNEobj` or `UMAPobj` config
+        :param projection: Projection of the data by the model
+        :return:
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_filepath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, projection, allow_pickle=False)
+            os.replace(tmp_filepath, self._filepath(model))
+        except BaseException:
+            os.unlink(tmp_filepath)
+            raise
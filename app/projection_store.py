@@ -0,0 +1,186 @@
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import json
+import numpy as np
+import os
+from collections.abc import Mapping
+
+INDEX_FILENAME = "index.json"
+PROJECTIONS_FILENAME = "projections.npy"
+
+
+class ProjectionStoreWriter:
+    """Write a projection store incrementally, e.g. chunk by chunk when the projections don't fit in memory
+
+    The projections are written into a memory-mapped file, so the memory used by the writer doesn't grow with the
+        size of the store. Both the projections and the index are written under a temporary name and renamed by
+        `close()`, so readers never see a half-written store.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        models: Dict[str, dict],
+        n_rows: int,
+        n_components: int,
+        metrics: Optional[Dict[str, dict]] = None,
+        sample_size: Optional[int] = None,
+    ):
+        """
+        :param directory: Directory of the store
+        :param models: Model parameters of each config of the store, keyed by config key
+        :param n_rows: Number of rows of the projection of each config
+        :param n_components: Number of components of the projections
+        :param metrics: Quality metrics of each config (see `quality_metrics.compute_quality_metrics`), keyed by
+            config key
+        :param sample_size: Number of samples the models were fitted on, when they were only fitted on a sample of a
+            dataset too large for memory (see `prepare_results.save_umap_results_streaming`)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index = {
+            key: {"offset": i * n_rows, "n_rows": n_rows, "model": model}
+            for i, (key, model) in enumerate(models.items())
+        }
+        if metrics is not None:
+            for key, entry in self._index.items():
+                entry["metrics"] = metrics[key]
+        if sample_size is not None:
+            for entry in self._index.values():
+                entry["sample_size"] = sample_size
+        self._tmp_projections_filepath = self.directory.joinpath(f"{PROJECTIONS_FILENAME}.tmp")
+        self._projections = np.lib.format.open_memmap(
+            self._tmp_projections_filepath, mode="w+", dtype=np.float32, shape=(len(models) * n_rows, n_components)
+        )
+
+    def write(self, key: str, projection: np.ndarray, start: int = 0) -> None:
+        """Write (part of) the projection of a config
+
+        :param key: Config key
+        :param projection: Rows of the projection
+        :param start: Index of the first row of `projection` within the projection of the config
+        :return:
+        """
+        entry = self._index[key]
+        if start + len(projection) > entry["n_rows"]:
+            raise ValueError(f"Rows {start}:{start + len(projection)} are out of the {entry['n_rows']} rows of {key}")
+        offset = entry["offset"] + start
+        self._projections[offset : offset + len(projection)] = projection
+
+    def close(self) -> None:
+        self._projections.flush()
+        del self._projections
+
+        tmp_index_filepath = self.directory.joinpath(f"{INDEX_FILENAME}.tmp")
+        with open(tmp_index_filepath, "w") as f:
+            json.dump(self._index, f, indent=1)
+
+        os.replace(self._tmp_projections_filepath, self.directory.joinpath(PROJECTIONS_FILENAME))
+        os.replace(tmp_index_filepath, self.directory.joinpath(INDEX_FILENAME))
+
+    def __enter__(self) -> "ProjectionStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave the previous store (if any) untouched
+            del self._projections
+            os.unlink(self._tmp_projections_filepath)
+
+
+def write_projection_store(results: Dict[str, dict], directory: Path) -> None:
+    """Write the results of a sweep as a columnar projection store
+
+    The store is made of a single contiguous float32 array holding the projections of all the configs one after the
+        other, and a JSON index mapping each config key to its offset, its number of rows, its model parameters and its
+        quality metrics (if any).
+
+    :param results: Results of a sweep, i.e. {key: {"proj": projection, "model": model parameters}}, plus the
+        "metrics" of each config if they were computed
+    :param directory: Directory of the store
+    :return:
+    """
+    shapes = {result["proj"].shape for result in results.values()}
+    if len(shapes) != 1:
+        raise ValueError(f"All the projections of a store must have the same shape, got {shapes}")
+    n_rows, n_components = shapes.pop()
+
+    models = {key: result["model"] for key, result in results.items()}
+    metrics = None
+    if all("metrics" in result for result in results.values()):
+        metrics = {key: result["metrics"] for key, result in results.items()}
+    with ProjectionStoreWriter(directory, models, n_rows, n_components, metrics) as writer:
+        for key, result in results.items():
+            writer.write(key, result["proj"])
+
+
+class ProjectionStore(Mapping):
+    """Read-only view of a projection store written by `write_projection_store`
+
+    The projections are opened as a read-only memory map: the pages are shared by all the processes opening the same
+        store and only the configs that are actually accessed are read from disk.
+    `store[key]` returns the (n_rows, n_components) projection of a config as a view into the memory map.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        with open(self.directory.joinpath(INDEX_FILENAME)) as f:
+            self._index = json.load(f)
+        self._projections = np.load(self.directory.joinpath(PROJECTIONS_FILENAME), mmap_mode="r")
+        self._entries = list(self._index.values())
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        entry = self._index[key]
+        return self._projections[entry["offset"] : entry["offset"] + entry["n_rows"]]
+
+    def at(self, position: int) -> np.ndarray:
+        """Projection of the config at a position of the store, e.g. the offset of the config in its parameter grid
+            (see `model_configs.ParamGrid`), since stores are written in the order of the grid
+
+        :param position: Position of the config in the index of the store
+        :return:
+        """
+        entry = self._entries[position]
+        return self._projections[entry["offset"] : entry["offset"] + entry["n_rows"]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the projections, i.e. the memory they take once all their pages are read
+
+        :return:
+        """
+        return self._projections.nbytes
+
+    @property
+    def sample_size(self) -> Optional[int]:
+        """Number of samples the models were fitted on, for a store written out-of-core (None otherwise)
+
+        :return:
+        """
+        return self._entries[0].get("sample_size") if self._entries else None
+
+    def model(self, key: str) -> dict:
+        """Parameters of the model that produced the projection of a config
+
+        :param key: Config key, i.e. `get_properties_str()` of the model
+        :return:
+        """
+        return self._index[key]["model"]
+
+    def metric_values(self, name: str) -> np.ndarray:
+        """Values of a quality metric for all the configs, in the order of the store (i.e. of the parameter grid)
+
+        :param name: Name of the metric, e.g. "trustworthiness" (see `quality_metrics.QUALITY_METRICS`)
+        :return: A float array, NaN for the configs without this metric (e.g. a store written before the metrics)
+        """
+        values = [entry.get("metrics", {}).get(name) for entry in self._entries]
+        return np.array([np.nan if value is None else value for value in values], dtype=float)
@@ -0,0 +1,139 @@
+from typing import Dict, List, Optional
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Quality metrics of a projection, by name (as stored in the projection stores) and title
+QUALITY_METRICS = {
+    "trustworthiness": "Trustworthiness",
+    "knn_preservation": "kNN preservation",
+    "silhouette": "Silhouette by label",
+}
+
+# Number of neighbors of the trustworthiness and kNN preservation
+N_NEIGHBORS = 10
+# The metrics need the distances between every pair of samples, so they're computed on a sample of the dataset
+SAMPLE_SIZE = 2_000
+# Memory budget of the distance matrices computed at once, i.e. the projections are processed in batches
+_BATCH_BYTES = 256 * 2**20
+
+
+def _pairwise_distances(x: np.ndarray) -> np.ndarray:
+    """Euclidean distances between the rows of one or a batch of arrays
+
+    :param x: An (..., n_samples, n_features) array
+    :return: An (..., n_samples, n_samples) float32 array
+    """
+    x = x.astype(np.float32)
+    squared_norms = np.einsum("...ij,...ij->...i", x, x)
+    squared_dists = squared_norms[..., :, None] + squared_norms[..., None, :] - 2 * x @ np.swapaxes(x, -1, -2)
+    return np.sqrt(np.maximum(squared_dists, 0, out=squared_dists), out=squared_dists)
+
+
+def _neighbor_ranks(data: np.ndarray) -> np.ndarray:
+    """Rank of every sample among the neighbors of each sample in the input space, i.e. 1 for the nearest neighbor
+        (and 0 for the sample itself)
+
+    :return: An (n_samples, n_samples) array, where [i, j] is the rank of j among the neighbors of i
+    """
+    dists = _pairwise_distances(data)
+    np.fill_diagonal(dists, -1)
+    order = np.argsort(dists, axis=1, kind="stable")
+    ranks = np.empty(dists.shape, dtype=np.int32)
+    np.put_along_axis(ranks, order, np.arange(len(data), dtype=np.int32)[None, :], axis=1)
+    return ranks
+
+
+def _silhouettes(dists: np.ndarray, label_codes: np.ndarray) -> np.ndarray:
+    """Mean silhouette coefficient of a batch of projections, with the same conventions as scikit-learn's
+        `silhouette_score` (the coefficient of a sample alone in its label is 0)
+
+    :param dists: An (n_projections, n_samples, n_samples) array of distances
+    :param label_codes: Label of each sample, as integers in [0, n_labels)
+    :return: The silhouette of each projection
+    """
+    one_hot = np.eye(label_codes.max() + 1, dtype=np.float32)[label_codes]
+    counts = one_hot.sum(axis=0)
+    # Sum of the distances of every sample to the samples of each label, for all the projections at once
+    label_dists = dists @ one_hot
+    own_dists = np.take_along_axis(label_dists, label_codes[None, :, None], axis=-1)[..., 0]
+    own_counts = counts[label_codes]
+    intra = own_dists / np.maximum(own_counts - 1, 1)
+    mean_label_dists = label_dists / counts
+    np.put_along_axis(mean_label_dists, label_codes[None, :, None], np.inf, axis=-1)
+    inter = mean_label_dists.min(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coefficients = np.nan_to_num((inter - intra) / np.maximum(intra, inter))
+    coefficients[:, own_counts == 1] = 0
+    return coefficients.mean(axis=1)
+
+
+def compute_quality_metrics(
+    data: np.ndarray,
+    projections: List[np.ndarray],
+    labels: Optional[np.ndarray] = None,
+    n_neighbors: int = N_NEIGHBORS,
+    sample_size: int = SAMPLE_SIZE,
+    seed: int = 0,
+) -> List[Dict[str, Optional[float]]]:
+    """Compute the quality metrics of the projections of a sweep
+
+    - Trustworthiness: whether the neighbors of each sample in the projection are also neighbors in the input space
+        (same definition as scikit-learn's `trustworthiness`).
+    - kNN preservation: share of the `n_neighbors` nearest neighbors of each sample in the input space that are kept
+        among its `n_neighbors` nearest neighbors in the projection.
+    - Silhouette by label: how well the labels are separated in the projection.
+
+    The neighbor ranks in the input space are computed once and shared by all the projections, which are then scored
+        in batches of vectorized array operations rather than one by one.
+
+    :param data: Input data (features) of the projections
+    :param projections: Projections of the data, one per config
+    :param labels: Label of each sample. Without labels, the silhouette is None.
+    :param n_neighbors: Number of neighbors of the trustworthiness and the kNN preservation
+    :param sample_size: Above this number of samples, the metrics are computed on a random sample of this size
+    :param seed: Seed of the sample
+    :return: The metrics of each projection (see `QUALITY_METRICS`), in the order of `projections`
+    """
+    n_samples = len(data)
+    rows = slice(None)
+    if n_samples > sample_size:
+        rows = np.sort(np.random.default_rng(seed).choice(n_samples, sample_size, replace=False))
+        n_samples = sample_size
+    data = np.asarray(data, dtype=np.float32)[rows]
+    # Trustworthiness is only defined for fewer neighbors than half of the samples
+    n_neighbors = min(n_neighbors, (n_samples - 1) // 2)
+    label_codes = None
+    if labels is not None:
+        _, label_codes = np.unique(np.asarray(labels)[rows], return_inverse=True)
+        if not 2 <= label_codes.max() + 1 <= n_samples - 1:
+            label_codes = None
+
+    ranks = _neighbor_ranks(data)
+    trust_normalization = 2 / (n_samples * n_neighbors * (2 * n_samples - 3 * n_neighbors - 1))
+    batch_size = max(1, _BATCH_BYTES // (4 * n_samples**2))
+    logger.info(f"Computing the quality metrics of {len(projections)} projections on {n_samples} samples")
+    metrics = []
+    for start in range(0, len(projections), batch_size):
+        batch = np.stack([np.asarray(projection)[rows] for projection in projections[start : start + batch_size]])
+        dists = _pairwise_distances(batch)
+        if label_codes is not None:
+            silhouettes = _silhouettes(dists, label_codes)
+        # Nearest neighbors of each sample in the projections, excluding the sample itself
+        dists[:, np.arange(n_samples), np.arange(n_samples)] = np.inf
+        knn_indices = np.argpartition(dists, n_neighbors - 1, axis=-1)[..., :n_neighbors]
+        knn_ranks = np.take_along_axis(ranks[None], knn_indices, axis=-1)
+        trustworthiness = 1 - trust_normalization * np.maximum(knn_ranks - n_neighbors, 0).sum(axis=(1, 2))
+        knn_preservation = (knn_ranks <= n_neighbors).mean(axis=(1, 2))
+        for i in range(len(batch)):
+            metrics.append(
+                {
+                    "trustworthiness": round(float(trustworthiness[i]), 4),
+                    "knn_preservation": round(float(knn_preservation[i]), 4),
+                    "silhouette": None if label_codes is None else round(float(silhouettes[i]), 4),
+                }
+            )
+    return metrics
@@ -0,0 +1,123 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+# Average number of points per cell of the grid. Smaller cells mean fewer candidates to check per query, but more
+#   cells to go through for large boxes.
+POINTS_PER_CELL = 8
+
+
+class GridIndex:
+    """Spatial index of the points of a 2-d projection, for the point-level details of the dashboard (hover, click and
+        box/lasso selection)
+
+    The bounding box of the points is split into a uniform grid of cells, and the points are sorted by cell, so the
+        points of a column of cells are a contiguous slice of `order`. A query only checks the points of the cells it
+        overlaps, i.e. it costs about the number of points it returns rather than the size of the projection.
+    This module only depends on numpy, so the web process can build indexes without importing the compute path.
+    """
+
+    def __init__(self, points: np.ndarray, points_per_cell: int = POINTS_PER_CELL):
+        """
+        :param points: An (n_points, 2) array, e.g. a (memory-mapped) projection of the store. It isn't copied.
+        :param points_per_cell: Average number of points per cell
+        """
+        self.points = np.asarray(points, dtype=np.float32)
+        self.n_cells = max(1, int(np.sqrt(len(self.points) / points_per_cell)))
+        self.lower = self.points.min(axis=0)
+        upper = self.points.max(axis=0)
+        # Cells can't be empty along an axis, e.g. when all the points have the same x
+        self.cell_size = np.maximum((upper - self.lower) / self.n_cells, np.finfo(np.float32).eps)
+        cells = self._cells(self.points)
+        cell_ids = cells[:, 0] * self.n_cells + cells[:, 1]
+        self.order = np.argsort(cell_ids, kind="stable").astype(np.int32)
+        # Points of the cell i are order[cell_starts[i] : cell_starts[i + 1]]
+        self.cell_starts = np.searchsorted(cell_ids[self.order], np.arange(self.n_cells**2 + 1))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory of the index, including its points unless they're a view of a memory-mapped projection
+
+        :return:
+        """
+        points_nbytes = 0 if isinstance(self.points.base, np.memmap) else self.points.nbytes
+        return points_nbytes + self.order.nbytes + self.cell_starts.nbytes
+
+    def _cells(self, xy: np.ndarray) -> np.ndarray:
+        """Cell of each point, where points off the bounding box fall into the nearest cell
+
+        :param xy: An (n, 2) array
+        :return: An (n, 2) int array of the column and the row of each cell
+        """
+        cells = np.floor((np.asarray(xy, dtype=np.float64) - self.lower) / self.cell_size)
+        return np.clip(cells, 0, self.n_cells - 1).astype(np.int64)
+
+    def _candidates(self, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Points of the cells from `low` to `high` (included), i.e. a superset of the points within the box they cover
+
+        :param low: Column and row of the bottom left cell
+        :param high: Column and row of the top right cell
+        :return: Rows of the points
+        """
+        columns = np.arange(low[0], high[0] + 1) * self.n_cells
+        starts, ends = self.cell_starts[columns + low[1]], self.cell_starts[columns + high[1] + 1]
+        return np.concatenate([self.order[start:end] for start, end in zip(starts, ends)])
+
+    def box(self, x_range: Tuple[float, float], y_range: Tuple[float, float]) -> np.ndarray:
+        """Points within a box, e.g. a box selection
+
+        :param x_range: (min, max) of x
+        :param y_range: (min, max) of y
+        :return: Rows of the points, sorted
+        """
+        rows = self._candidates(*self._cells([[x_range[0], y_range[0]], [x_range[1], y_range[1]]]))
+        x, y = self.points[rows, 0], self.points[rows, 1]
+        in_box = (x >= x_range[0]) & (x <= x_range[1]) & (y >= y_range[0]) & (y <= y_range[1])
+        return np.sort(rows[in_box])
+
+    def lasso(self, xs: Sequence[float], ys: Sequence[float]) -> np.ndarray:
+        """Points within a polygon, e.g. a lasso selection (even-odd rule)
+
+        :param xs: x of the vertices of the polygon
+        :param ys: y of the vertices of the polygon
+        :return: Rows of the points, sorted
+        """
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        rows = self.box((xs.min(), xs.max()), (ys.min(), ys.max()))
+        x, y = self.points[rows, 0], self.points[rows, 1]
+        inside = np.zeros(len(rows), dtype=bool)
+        # Flip the state of the points whose horizontal ray to the right crosses each edge of the polygon
+        for x_a, y_a, x_b, y_b in zip(xs, ys, np.roll(xs, 1), np.roll(ys, 1)):
+            crosses = (y_a > y) != (y_b > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                inside ^= crosses & (x < x_a + (y - y_a) * (x_b - x_a) / (y_b - y_a))
+        return rows[inside]
+
+    def nearest(self, x: float, y: float, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest points of a position, e.g. the one under the cursor and its neighbors
+
+        The cells around the position are searched in growing squares until there are k candidates. The distance of the
+            k-th one bounds the box in which the k nearest points are.
+
+        :param x:
+        :param y:
+        :param k: Number of points
+        :return: The rows and the distances of the points, sorted by distance
+        """
+        k = min(k, len(self))
+        center = self._cells([[x, y]])[0]
+        radius = 0
+        while True:
+            rows = self._candidates(np.maximum(center - radius, 0), np.minimum(center + radius, self.n_cells - 1))
+            if len(rows) >= k:
+                break
+            radius = 2 * radius + 1
+        # Slightly enlarged, so the k-th point isn't left out by a rounding error
+        kth_dist = np.sort(np.hypot(self.points[rows, 0] - x, self.points[rows, 1] - y))[k - 1] * (1 + 1e-6) + 1e-12
+        rows = self.box((x - kth_dist, x + kth_dist), (y - kth_dist, y + kth_dist))
+        dists = np.hypot(self.points[rows, 0] - x, self.points[rows, 1] - y)
+        nearest = np.argsort(dists, kind="stable")[:k]
+        return rows[nearest], dists[nearest]